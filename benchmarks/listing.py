@@ -0,0 +1,106 @@
+"""
+Benchmark sharded bucket listing against a fake Cloud Storage client.
+
+Every listing page sleeps for --page-latency seconds, like a round trip to
+Cloud Storage. Each folder of the fake bucket becomes one shard, so with the
+default sizes every shard holds far more objects than SHARD_BUFFER_SIZE.
+
+    python benchmarks/listing.py --shards 4 --objects-per-shard 20000 --page-latency 0.1
+"""
+
+import argparse
+import sys
+import time
+import types
+from unittest import mock
+
+from cogee import cogee
+
+PAGE_SIZE = 1000
+
+
+class FakeBlob:
+    def __init__(self, name):
+        self.name = name
+        self.size = 1
+        self.generation = 1
+        self.time_created = None
+        self.updated = None
+
+
+class FakeListing:
+    def __init__(self, names, prefixes, latency):
+        self.names = names
+        self.prefixes = set()
+        self._prefixes = prefixes
+        self._latency = latency
+
+    @property
+    def pages(self):
+        for start in range(0, max(len(self.names), 1), PAGE_SIZE):
+            time.sleep(self._latency)
+            self.prefixes |= self._prefixes
+            yield [FakeBlob(name) for name in self.names[start : start + PAGE_SIZE]]
+
+    def __iter__(self):
+        for page in self.pages:
+            yield from page
+
+
+def fake_storage(names, latency):
+    class FakeClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def list_blobs(
+            self, bucket, prefix=None, delimiter=None, start_offset=None, end_offset=None, **kwargs
+        ):
+            prefix = prefix or ""
+            selected = [
+                name
+                for name in names
+                if name.startswith(prefix)
+                and (start_offset is None or name >= start_offset)
+                and (end_offset is None or name < end_offset)
+            ]
+            if not delimiter:
+                return FakeListing(selected, set(), latency)
+            prefixes = {
+                prefix + name[len(prefix) :].split(delimiter)[0] + delimiter
+                for name in selected
+                if delimiter in name[len(prefix) :]
+            }
+            return FakeListing([], prefixes, latency)
+
+    return types.SimpleNamespace(Client=FakeClient)
+
+
+def run(label, **kwargs):
+    started = time.monotonic()
+    count = sum(1 for _ in cogee.list_tif("bucket", None, None, **kwargs))
+    print(f"{label:<28} {count} objects in {time.monotonic() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--objects-per-shard", type=int, default=20000)
+    parser.add_argument("--page-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    names = sorted(
+        f"folder_{shard}/scene_{index:07d}.tif"
+        for shard in range(args.shards)
+        for index in range(args.objects_per_shard)
+    )
+    storage = fake_storage(names, args.page_latency)
+    with mock.patch.dict(sys.modules, {"google.cloud.storage": storage}), mock.patch(
+        "google.cloud.storage", storage, create=True
+    ):
+        run("unsharded")
+        run(f"{args.shards} shards, key order", shards=args.shards, ordered=True)
+        run(f"{args.shards} shards", shards=args.shards)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Count Earth Engine RPCs per registered asset against a fake Earth Engine client.
+
+Every RPC sleeps for --rpc-latency seconds and Initialize sleeps for
+--init-latency seconds, like the discovery request of the real client. The
+per-asset run reproduces the original register_single_asset, which loaded
+the key file and initialized Earth Engine for every asset; the session run
+is cogee register with one shared EESession.
+
+    python benchmarks/session.py --assets 500 --workers 16
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import sys
+import threading
+import time
+import types
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from cogee import cogee
+
+COLLECTION = "projects/bench/assets/collection"
+
+
+class FakeEE:
+    """
+    The parts of the ee module cogee uses, counting every call.
+    """
+
+    def __init__(self, rpc_latency, init_latency):
+        self.rpc_latency = rpc_latency
+        self.init_latency = init_latency
+        self.calls = Counter()
+        self.assets = {COLLECTION: {"id": COLLECTION, "type": "IMAGE_COLLECTION"}}
+        self._lock = threading.Lock()
+
+        class EEException(Exception):
+            pass
+
+        data = types.SimpleNamespace(
+            ASSET_TYPE_IMAGE_COLL="ImageCollection",
+            ASSET_TYPE_IMAGE_COLL_CLOUD="IMAGE_COLLECTION",
+            getAsset=self.getAsset,
+            getInfo=self.getInfo,
+            createAsset=self.createAsset,
+            deleteAsset=self.deleteAsset,
+            listAssets=self.listAssets,
+            setDeadline=lambda ms: None,
+        )
+        self.module = types.SimpleNamespace(
+            data=data,
+            ee_exception=types.SimpleNamespace(EEException=EEException),
+            EEException=EEException,
+            ServiceAccountCredentials=self.ServiceAccountCredentials,
+            Initialize=self.Initialize,
+        )
+
+    def _count(self, name, latency):
+        with self._lock:
+            self.calls[name] += 1
+        time.sleep(latency)
+
+    def ServiceAccountCredentials(self, account, cred):
+        self._count("key file reads", 0)
+        return types.SimpleNamespace(token=None, expiry=None)
+
+    def Initialize(self, credentials=None, **kwargs):
+        self._count("Initialize", self.init_latency)
+
+    def getAsset(self, path):
+        self._count("getAsset", self.rpc_latency)
+        if path not in self.assets:
+            raise self.module.EEException(f"Asset '{path}' not found.")
+        return self.assets[path]
+
+    def getInfo(self, path):
+        self._count("getInfo", self.rpc_latency)
+        return self.assets.get(path)
+
+    def createAsset(self, value, path, properties=None):
+        self._count("createAsset", self.rpc_latency)
+        with self._lock:
+            if path in self.assets:
+                raise self.module.EEException(f"Cannot overwrite asset '{path}'.")
+            self.assets[path] = dict(value, id=path)
+        return {"id": path}
+
+    def deleteAsset(self, path):
+        self._count("deleteAsset", self.rpc_latency)
+        self.assets.pop(path, None)
+
+    def listAssets(self, params):
+        self._count("listAssets", self.rpc_latency)
+        parent = params["parent"]
+        return {
+            "assets": [
+                {"id": path, "name": path}
+                for path in self.assets
+                if path.startswith(parent + "/")
+            ]
+        }
+
+
+class FakeBlob:
+    def __init__(self, name):
+        self.name = name
+        self.size = 1
+        self.generation = 1
+        self.time_created = None
+        self.updated = None
+
+
+class FakeListing:
+    def __init__(self, names):
+        self.prefixes = set()
+        self.pages = iter([[FakeBlob(name) for name in names]])
+
+    def __iter__(self):
+        for page in self.pages:
+            yield from page
+
+
+def fake_storage(names):
+    class FakeClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def list_blobs(self, bucket, prefix=None, **kwargs):
+            return FakeListing(names)
+
+    return types.SimpleNamespace(Client=FakeClient)
+
+
+def per_asset(ee, names, workers):
+    # The original register_single_asset, minus manifest building
+    def task(name):
+        credentials = ee.ServiceAccountCredentials("bench@project.iam", "key.json")
+        ee.Initialize(credentials)
+        asset_id = f"{COLLECTION}/{name.split('/')[-1].split('.')[0]}"
+        if ee.data.getInfo(asset_id) is None:
+            ee.data.createAsset({"type": "IMAGE"}, asset_id)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(task, names))
+
+
+def session(ee, names, workers):
+    with contextlib.redirect_stdout(io.StringIO()):
+        cogee.register(
+            "bucket", None, COLLECTION, "key.json", "bench@project.iam", None, workers=workers
+        )
+
+
+def run(label, target, names, args):
+    fake = FakeEE(args.rpc_latency, args.init_latency)
+    storage = fake_storage(names)
+    with mock.patch.dict(
+        sys.modules, {"ee": fake.module, "google.cloud.storage": storage}
+    ), mock.patch("google.cloud.storage", storage, create=True):
+        started = time.monotonic()
+        target(fake.module, names, args.workers)
+        elapsed = time.monotonic() - started
+    rpcs = sum(count for name, count in fake.calls.items() if name != "key file reads")
+    print(
+        f"{label:<10} {len(names)} assets in {elapsed:.1f}s, "
+        f"{rpcs / len(names):.2f} RPCs per asset: "
+        + ", ".join(f"{name} {count}" for name, count in sorted(fake.calls.items()))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--assets", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--rpc-latency", type=float, default=0.05)
+    parser.add_argument("--init-latency", type=float, default=0.3)
+    args = parser.parse_args()
+    # One line per registered asset would drown the results
+    logging.disable(logging.INFO)
+
+    names = [f"scene_{index:07d}.tif" for index in range(args.assets)]
+    run("per asset", per_asset, names, args)
+    run("session", session, names, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+__copyright__ = """
+    Copyright 2023-2024 Samapriya Roy
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import itertools
+import json
+import logging
+import os
+import pickle
+import queue
+import threading
+from concurrent.futures import Future
+
+from .throttle import RateLimiter, status_code
+
+LEAST_LOADED = "least-loaded"
+ROUND_ROBIN = "round-robin"
+STRATEGIES = (LEAST_LOADED, ROUND_ROBIN)
+
+
+def resolve_credentials(sources):
+    """
+    Expand service account key files and folders of key files.
+
+    Args:
+        sources (list): Paths of JSON key files or of folders holding them.
+
+    Returns:
+        list: (key file path, service account email) tuples.
+    """
+    accounts = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths = sorted(
+                os.path.join(source, name)
+                for name in os.listdir(source)
+                if name.lower().endswith(".json")
+            )
+        else:
+            paths = [source]
+        for path in paths:
+            try:
+                with open(path) as f:
+                    email = json.load(f).get("client_email")
+            except (OSError, ValueError, AttributeError) as error:
+                raise ValueError(f"Could not read service account key {path}: {error}")
+            if not email:
+                if path == source:
+                    raise ValueError(f"{path} is not a service account key")
+                logging.warning(f"Skipping {path}: not a service account key")
+                continue
+            accounts.append((path, email))
+    if not accounts:
+        raise ValueError(f"No service account keys found in {', '.join(sources)}")
+    return accounts
+
+
+class RemoteError(Exception):
+    """
+    An error raised in an account process that could not be sent back as is.
+
+    The message keeps the original type name and the HTTP status is preserved
+    so retry and throttling decisions are unchanged.
+    """
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _portable(error):
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return RemoteError(f"{type(error).__name__}: {error}", status_code(error))
+
+
+def _serve(index, cred, account, settings, tasks, results):
+    """
+    Entry point of an account process: one Earth Engine session, many threads.
+    """
+    import ee
+
+    from .session import EESession
+    from .throttle import AdaptiveConcurrency
+
+    workers = settings["workers"]
+    limiter = RateLimiter(qps=settings["qps"], max_concurrent=settings["max_concurrent"])
+    controller = None
+    if settings["adaptive"]:
+        controller = AdaptiveConcurrency(
+            limiter,
+            initial=min(settings["max_concurrent"] or 4, workers),
+            maximum=workers,
+        )
+    try:
+        session = EESession(
+            cred=cred,
+            account=account,
+            limiter=limiter,
+            controller=controller,
+            deadline=settings["deadline"],
+        ).initialize()
+    except Exception as error:
+        results.put(("failed", index, f"{type(error).__name__}: {error}"))
+        return
+    results.put(("ready", index, None))
+
+    def work():
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            request, name, args, kwargs = task
+            try:
+                value = session.call(getattr(ee.data, name), *args, **kwargs)
+            except Exception as error:
+                results.put(("error", request, _portable(error)))
+            else:
+                results.put(("result", request, value))
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    final = controller.limit if controller is not None else None
+    results.put(("stats", index, (limiter.calls, limiter.achieved_qps(), final)))
+
+
+class AccountPool:
+    """
+    Earth Engine requests spread over several service accounts.
+
+    The Earth Engine client keeps its credentials in process wide state, so
+    every account gets its own process with its own session, rate limiter and
+    worker threads. The pool has the same call() interface as EESession: each
+    request is sent to an account process and the result or error is handed
+    back to the calling thread, so retries, skips and dead-letter handling
+    stay unchanged.
+
+    Args:
+        accounts (list): (key file path, service account email) tuples.
+        workers (int): Threads per account.
+        qps (float, optional): Requests per second per account.
+        max_concurrent (int, optional): Requests in flight per account.
+        adaptive (bool): Adaptive concurrency in every account.
+        deadline (float, optional): Timeout in seconds for each request.
+        strategy (str): least-loaded sends each request to the account with
+            the fewest requests in flight, round-robin cycles through the
+            accounts.
+    """
+
+    def __init__(
+        self,
+        accounts,
+        workers,
+        qps=None,
+        max_concurrent=None,
+        adaptive=False,
+        deadline=None,
+        strategy=LEAST_LOADED,
+    ):
+        self.accounts = accounts
+        self.workers = workers
+        self.strategy = strategy
+        self.settings = {
+            "workers": workers,
+            "qps": qps,
+            "max_concurrent": max_concurrent,
+            "adaptive": adaptive,
+            "deadline": deadline,
+        }
+        # Counts every dispatched request, the limits apply per account
+        self.limiter = RateLimiter()
+        self.stats = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._requests = itertools.count()
+        self._live = list(range(len(accounts)))
+        self._in_flight = [0] * len(accounts)
+        self._cursor = 0
+        self._processes = []
+        self._receiver = None
+        self._closing = False
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def initialize(self):
+        """
+        Start one process per account and wait until all of them are signed in.
+        """
+        import multiprocessing
+
+        # spawn, since forking a process that already runs threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        self._results = context.Queue()
+        # One queue per account, so the requests of a process that dies are
+        # known and can be handed to another account
+        self._queues = [context.Queue() for _ in self.accounts]
+        for index, (cred, account) in enumerate(self.accounts):
+            process = context.Process(
+                target=_serve,
+                args=(index, cred, account, self.settings, self._queues[index], self._results),
+                name=f"cogee-account-{index}",
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+        failed = []
+        waiting = set(range(len(self.accounts)))
+        while waiting:
+            try:
+                kind, index, message = self._results.get(timeout=1)
+            except queue.Empty:
+                for index in list(waiting):
+                    exitcode = self._processes[index].exitcode
+                    if exitcode is not None:
+                        waiting.discard(index)
+                        failed.append(f"{self.accounts[index][1]}: exited with code {exitcode}")
+                continue
+            waiting.discard(index)
+            if kind == "failed":
+                failed.append(f"{self.accounts[index][1]}: {message}")
+        if failed:
+            self.close()
+            raise RuntimeError("Could not initialize " + "; ".join(failed))
+        logging.info(
+            f"Initialized {len(self.accounts)} service accounts, {self.strategy} dispatch"
+        )
+        self._receiver = threading.Thread(
+            target=self._receive, name="cogee-account-results", daemon=True
+        )
+        self._receiver.start()
+        self._watcher = threading.Thread(
+            target=self._watch, name="cogee-account-watcher", daemon=True
+        )
+        self._watcher.start()
+        return self
+
+    def _watch(self):
+        """
+        Report account processes that exit, whether or not results arrive.
+        """
+        from multiprocessing.connection import wait
+
+        sentinels = {process.sentinel: index for index, process in enumerate(self._processes)}
+        while sentinels:
+            for sentinel in wait(list(sentinels)):
+                index = sentinels.pop(sentinel)
+                process = self._processes[index]
+                process.join()
+                exitcode = process.exitcode
+                if self._closing and exitcode == 0:
+                    continue
+                # Sent through the results queue so that everything the
+                # process reported before it died is handled first
+                self._results.put(("exited", index, exitcode))
+
+    def _receive(self):
+        stopped = set()
+        while len(stopped) < len(self._processes):
+            kind, key, value = self._results.get()
+            if kind == "stats":
+                self.stats[self.accounts[key][1]] = value
+                stopped.add(key)
+                continue
+            if kind == "exited":
+                stopped.add(key)
+                self._requeue(key, value)
+                continue
+            with self._lock:
+                future, account, _ = self._pending.pop(key, (None, None, None))
+                if future is not None:
+                    self._in_flight[account] -= 1
+            if future is None:
+                continue
+            if kind == "error":
+                future.set_exception(value)
+            else:
+                future.set_result(value)
+
+    def _requeue(self, index, exitcode):
+        account = self.accounts[index][1]
+        logging.error(f"Process for {account} exited with code {exitcode}")
+        failed = []
+        with self._lock:
+            if index in self._live:
+                self._live.remove(index)
+            orphaned = [
+                request for request, (_, target, _) in self._pending.items() if target == index
+            ]
+            for request in orphaned:
+                future, _, task = self._pending.pop(request)
+                if self._live:
+                    self._dispatch(request, future, task)
+                else:
+                    failed.append(future)
+            self._in_flight[index] = 0
+        if orphaned and not failed:
+            logging.warning(f"Resent {len(orphaned)} requests of {account} to other accounts")
+        for future in failed:
+            future.set_exception(RemoteError(f"Process for {account} exited"))
+
+    def _dispatch(self, request, future, task):
+        # Called with the lock held
+        if self.strategy == ROUND_ROBIN:
+            self._cursor = (self._cursor + 1) % len(self._live)
+            account = self._live[self._cursor]
+        else:
+            account = min(self._live, key=self._in_flight.__getitem__)
+        self._in_flight[account] += 1
+        self._pending[request] = (future, account, task)
+        self._queues[account].put(task)
+
+    def call(self, func, *args, **kwargs):
+        """
+        Issue an ee.data request from one of the account processes.
+
+        Args:
+            func (callable): An ee.data function, e.g. ee.data.createAsset.
+
+        Returns:
+            The result of func(*args, **kwargs).
+        """
+        future = Future()
+        request = next(self._requests)
+        with self.limiter:
+            with self._lock:
+                if not self._live:
+                    raise RuntimeError("No service account processes left")
+                self._dispatch(request, future, (request, func.__name__, args, kwargs))
+            return future.result()
+
+    def close(self):
+        """
+        Stop the account processes once their queued requests are done.
+        """
+        self._closing = True
+        for tasks in self._queues:
+            for _ in range(self.workers):
+                tasks.put(None)
+        if self._receiver is not None:
+            self._receiver.join()
+        for process in self._processes:
+            process.join()
+        for account, (calls, achieved, final) in self.stats.items():
+            line = f"{account}: {calls} requests"
+            if achieved is not None:
+                line += f" at {achieved:.1f} requests/sec"
+            if final is not None:
+                line += f", final concurrency {final}"
+            print(line)
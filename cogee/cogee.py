@@ -13,21 +13,62 @@ __copyright__ = """
 __license__ = "Apache 2.0"
 
 import argparse
+import hashlib
+import itertools
 import json
 import logging
 import os
+import socket
 import sys
+import threading
+import time
 import webbrowser
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-import ee
-import google
-import pkg_resources
-import requests
-from bs4 import BeautifulSoup
-from google.cloud import storage
-from google.cloud.exceptions import GoogleCloudError
+# Earth Engine and Cloud Storage clients are imported inside the commands that
+# need them so `cogee --help` and `cogee readme` start without loading them.
+from .accounts import LEAST_LOADED, STRATEGIES, AccountPool, resolve_credentials
+from .diff import MISSING, sort_pairs, sort_records, sorted_merge
+from .inventory import (
+    TIF_EXTENSIONS,
+    CogRecord,
+    InventoryCache,
+    read_inventory_reports,
+)
+from .journal import Journal, read_journal
+from .plan import PlanWriter, read_plan
+from .pool import (
+    FAILED,
+    REGISTERED,
+    SKIPPED,
+    UPDATED,
+    Interleave,
+    Prefetch,
+    default_workers,
+    run_bounded,
+)
+from .retry import DeadLetter, RetryPolicy
+from .session import EESession
+from .state import RegistrationState
+from .throttle import AdaptiveConcurrency, RateLimiter
+from .version_check import VersionCheck, version_check_disabled
+from .workqueue import WorkQueue
+
+# Objects buffered ahead of the consumer, per shard when listing in key order
+SHARD_BUFFER_SIZE = 10000
+
+DEFAULT_MATCH_GLOB = "**.{tif,TIF,Tif,tiff,TIFF,Tiff}"
+# Only the object fields used to build manifests are requested when listing
+LISTING_FIELDS = "items(name,size,timeCreated,updated,generation),nextPageToken"
+# Only the asset names are needed to diff against a collection
+COLLECTION_FIELDS = "assets(name,id),nextPageToken"
+# Asset property holding the generation of the source object
+GENERATION_PROPERTY = "source_generation"
+COLLECTION_GENERATION_FIELDS = (
+    f"assets(name,id,properties/{GENERATION_PROPERTY}),nextPageToken"
+)
 
 logging.basicConfig(
     format="%(asctime)s %(levelname)-4s %(message)s",
@@ -35,61 +76,6 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M:%S",
 )
 
-class Solution:
-    """
-    A class for comparing version strings.
-    """
-
-    def compareVersion(self, version1, version2):
-        """
-        Compare two version strings.
-
-        Args:
-            version1 (str): The first version string.
-            version2 (str): The second version string.
-
-        Returns:
-            int: 1 if version1 > version2, -1 if version1 < version2, 0 if equal.
-        """
-        versions1 = [int(v) for v in version1.split(".")]
-        versions2 = [int(v) for v in version2.split(".")]
-        for i in range(max(len(versions1), len(versions2))):
-            v1 = versions1[i] if i < len(versions1) else 0
-            v2 = versions2[i] if i < len(versions2) else 0
-            if v1 > v2:
-                return 1
-            elif v1 < v2:
-                return -1
-        return 0
-
-
-ob1 = Solution()
-
-
-def cogee_version():
-    """
-    Check and notify about the latest version of the 'cogee' package.
-    """
-    url = "https://pypi.org/project/cogee/"
-    source = requests.get(url)
-    html_content = source.text
-    soup = BeautifulSoup(html_content, "html.parser")
-    company = soup.find("h1")
-    vcheck = ob1.compareVersion(
-        company.string.strip().split(" ")[-1],
-        pkg_resources.get_distribution("cogee").version,
-    )
-    if vcheck == 1:
-        print(
-            f"Current version of cogee is {pkg_resources.get_distribution('cogee').version} upgrade to latest version: {company.string.strip().split(' ')[-1]}"
-        )
-    elif vcheck == -1:
-        print(
-            f"Possibly running staging code {pkg_resources.get_distribution('cogee').version} compared to pypi release {company.string.strip().split(' ')[-1]}"
-        )
-
-cogee_version()
-
 # Go to the readMe
 def readme():
     try:
@@ -121,9 +107,10 @@ def init(project):
     2. Specifies the OAuth 2.0 authentication scopes required for Earth Engine access.
     3. Retrieves the Google Cloud Platform credentials and project ID associated with the specified scopes.
     4. Initializes the Earth Engine client using the obtained credentials and the specified project name.
-
-    Note: Make sure the necessary Google Cloud Platform and Earth Engine libraries are imported before calling this function.
     """
+    import ee
+    import google.auth
+
     try:
         logging.info("Logging into Google Cloud Project & initializing Earth Engine")
 
@@ -179,6 +166,9 @@ def list_buckets(project_id):
     Returns:
         list of str: A list of bucket names.
     """
+    from google.cloud import storage
+    from google.cloud.exceptions import GoogleCloudError
+
     try:
         # Initialize a Google Cloud Storage client
         if project_id is not None:
@@ -206,158 +196,1172 @@ def buckets_from_parser(args):
     list_buckets(project_id=args.pid)
 
 
-def list_tif(bucket_name, prefix, limit):
+def shard_ranges(storage_client, bucket_name, prefix, shards):
+    """
+    Split the key space under a prefix into contiguous lexicographic ranges.
+
+    Range boundaries are taken from the sub-prefixes discovered with a
+    delimiter listing, descending while a level has a single sub-prefix.
+
+    Args:
+        storage_client (storage.Client): Cloud Storage client.
+        bucket_name (str): The name of the Cloud Storage bucket.
+        prefix (str, optional): Prefix being listed.
+        shards (int): Maximum number of ranges.
+
+    Returns:
+        list: (start_offset, end_offset) tuples in key order, None for open ends.
+    """
+    level = list_prefixes(storage_client, bucket_name, prefix or "")
+    for _ in range(3):
+        if len(level) != 1:
+            break
+        level = list_prefixes(storage_client, bucket_name, level[0])
+    if len(level) < 2:
+        return [(None, None)]
+
+    shards = min(shards, len(level))
+    boundaries = [level[len(level) * i // shards] for i in range(1, shards)]
+    starts = [None] + boundaries
+    ends = boundaries + [None]
+    return list(zip(starts, ends))
+
+
+def list_cog_blobs(
+    storage_client,
+    bucket_name,
+    prefix,
+    start_offset=None,
+    end_offset=None,
+    match_glob=DEFAULT_MATCH_GLOB,
+):
     """
-    List Cloud Storage objects with a specified prefix
+    List candidate COG blobs, filtering and projecting fields server side.
 
     Args:
+        storage_client (storage.Client): Cloud Storage client.
         bucket_name (str): The name of the Cloud Storage bucket.
         prefix (str, optional): Prefix for filtering objects within the bucket.
-        limit (int, optional): Maximum number of results to return.
+        start_offset (str, optional): First object name of the range.
+        end_offset (str, optional): Object name ending the range, exclusive.
+        match_glob (str, optional): Glob evaluated by Cloud Storage.
 
     Returns:
-        list: List of dictionaries containing properties of matching .tif files.
+        Iterator of blobs with only the listed fields populated.
     """
+    kwargs = {
+        "prefix": prefix,
+        "start_offset": start_offset,
+        "end_offset": end_offset,
+        "fields": LISTING_FIELDS,
+    }
+    if match_glob:
+        try:
+            return storage_client.list_blobs(bucket_name, match_glob=match_glob, **kwargs)
+        except TypeError:
+            # google-cloud-storage < 2.10 has no match_glob, filter client side only
+            logging.debug("match_glob not supported, filtering .tif files locally")
+    return storage_client.list_blobs(bucket_name, **kwargs)
+
+
+def list_blob_range(bucket_name, prefix, start_offset, end_offset, match_glob):
+    from google.cloud import storage
+
+    # one client per shard, clients are not shared across listing threads
+    return list_cog_blobs(
+        storage.Client(), bucket_name, prefix, start_offset, end_offset, match_glob
+    )
+
+
+def list_tif(
+    bucket_name, prefix, limit, shards=1, match_glob=DEFAULT_MATCH_GLOB, ordered=False
+):
+    """
+    List Cloud Storage .tif and .tiff objects with a specified prefix
+
+    Objects are yielded as listing pages arrive so registration can start
+    before the whole bucket has been listed. With more than one shard the key
+    space is split into lexicographic ranges that are listed concurrently and
+    objects are yielded from whichever range has data, unless ordered asks
+    for key order. Only objects matching match_glob are returned by Cloud
+    Storage, with just the fields cogee uses.
+
+    Args:
+        bucket_name (str): The name of the Cloud Storage bucket.
+        prefix (str, optional): Prefix for filtering objects within the bucket.
+        limit (int, optional): Stop listing after this many .tif files.
+        shards (int): Number of ranges to list concurrently.
+        match_glob (str, optional): Glob evaluated by Cloud Storage.
+        ordered (bool): Yield objects in key order. Ranges after the first
+            then only buffer SHARD_BUFFER_SIZE objects ahead of the consumer.
+
+    Yields:
+        CogRecord: Each matching .tif file.
+    """
+    from google.cloud import storage
+
     storage_client = storage.Client()
-    if limit is not None:
-        blobs = storage_client.list_blobs(
-            bucket_name, prefix=prefix, max_results=int(limit)
+    if limit is not None and int(limit) <= 0:
+        return
+
+    ranges = [(None, None)]
+    if shards > 1:
+        ranges = shard_ranges(storage_client, bucket_name, prefix, shards)
+    streams = []
+    if len(ranges) == 1:
+        blobs = list_cog_blobs(
+            storage_client, bucket_name, prefix, match_glob=match_glob
         )
     else:
-        blobs = storage_client.list_blobs(
-            bucket_name, prefix=prefix
+        logging.info(f"Listing gs://{bucket_name}/{prefix or ''} in {len(ranges)} shards")
+        listings = [
+            list_blob_range(bucket_name, prefix, start, end, match_glob) for start, end in ranges
+        ]
+        if ordered:
+            streams = [Prefetch(listing, maxsize=SHARD_BUFFER_SIZE) for listing in listings]
+            blobs = itertools.chain.from_iterable(streams)
+        else:
+            streams = [Interleave(listings, maxsize=SHARD_BUFFER_SIZE)]
+            blobs = streams[0]
+
+    found = 0
+    try:
+        for blob in blobs:
+            if blob.name.lower().endswith(TIF_EXTENSIONS):
+                yield CogRecord.from_blob(blob)
+                found += 1
+                if limit is not None and found >= int(limit):
+                    return
+    finally:
+        for stream in streams:
+            stream.close()
+
+
+def list_inventory(
+    bucket_name,
+    prefix,
+    limit,
+    shards=1,
+    match_glob=DEFAULT_MATCH_GLOB,
+    cache=None,
+    refresh=False,
+    max_age=None,
+    ordered=False,
+):
+    """
+    List COGs from the local inventory cache or from Cloud Storage.
+
+    Without a cache this is list_tif. With one, a listing refreshed less than
+    max_age seconds ago is read from the cache without listing the bucket,
+    otherwise the bucket is listed and the cache updated as objects stream by.
+
+    Args:
+        cache (InventoryCache, optional): Local inventory cache.
+        refresh (bool): Always list the bucket even if the cache is fresh.
+        max_age (float, optional): Maximum age in seconds of a reusable listing.
+        ordered (bool): Keep key order when listing in shards, see list_tif.
+
+    Yields:
+        CogRecord: Each matching .tif file.
+    """
+    if cache is None:
+        yield from list_tif(bucket_name, prefix, limit, shards, match_glob, ordered)
+        return
+
+    age = cache.age(bucket_name, prefix, match_glob)
+    if not refresh and age is not None and max_age is not None and age <= max_age:
+        logging.info(
+            f"Using cached listing of gs://{bucket_name}/{prefix or ''} from {age:.0f}s ago"
         )
-    tif_files = []
+        records = cache.records(bucket_name, prefix, match_glob)
+        yield from itertools.islice(records, int(limit) if limit is not None else None)
+        return
+
+    yield from cache.refresh(
+        bucket_name,
+        prefix,
+        match_glob,
+        list_tif(bucket_name, prefix, limit, shards, match_glob, ordered),
+        complete=limit is None,
+    )
 
-    for blob in blobs:
-        if blob.name.lower().endswith(".tif"):
-            properties = {
-                "name": blob.name,
-                "time_created": blob.time_created.strftime("%Y-%m-%dT%H:%M:%SZ"),
-                "time_updated": blob.updated.strftime("%Y-%m-%dT%H:%M:%SZ"),
-                "file_size_bytes": blob.size,
-            }
-            tif_files.append(properties)
-    return tif_files
 
+def list_prefixes(storage_client, bucket_name, prefix):
+    """
+    List the immediate sub-prefixes of a prefix using a delimiter listing.
+
+    Only the prefix set is fetched, objects directly under the prefix are the
+    only blobs returned, so this stays cheap even for very large buckets.
 
-def subfolders(bucket_name):
+    Args:
+        storage_client (storage.Client): Cloud Storage client.
+        bucket_name (str): The name of the Cloud Storage bucket.
+        prefix (str): Prefix to list, "" for the bucket root.
+
+    Returns:
+        list: Sorted sub-prefixes, each ending with "/".
+    """
+    blobs = storage_client.list_blobs(bucket_name, prefix=prefix, delimiter="/")
+    # prefixes are only populated as the pages are consumed
+    for _ in blobs.pages:
+        pass
+    return sorted(blobs.prefixes)
+
+
+def subfolders(bucket_name, depth=1, workers=None):
     """
     List subfolders within a Cloud Storage bucket.
 
+    Levels are walked breadth first, listing all prefixes of a level
+    concurrently.
+
     Args:
         bucket_name (str): The name of the Cloud Storage bucket.
+        depth (int): Number of folder levels to walk.
+        workers (int, optional): Number of concurrent listings.
     Returns:
         list: List of subfolder names.
     """
-    storage_client = storage.Client()
-    subfolders = set()
-    prefix = ""
-
-    try:
-        logging.info(f"Fetching subfolders/prefixes in bucket {bucket_name}")
-        blobs = storage_client.list_blobs(bucket_name, prefix="")
+    from google.cloud import storage
 
-        for blob in blobs:
-            relative_path = blob.name[len(prefix):]
-            parts = relative_path.split("/")
+    clients = threading.local()
 
-            if len(parts) > 1:
-                subfolders.add(parts[0])
+    def list_child_prefixes(prefix):
+        # one client per thread, clients are not shared across listing threads
+        if not hasattr(clients, "client"):
+            clients.client = storage.Client()
+        return list_prefixes(clients.client, bucket_name, prefix)
 
-        print(json.dumps(list(subfolders),indent=2))
+    try:
+        logging.info(f"Fetching subfolders/prefixes in bucket {bucket_name}")
+        level = [""]
+        found = []
+        with ThreadPoolExecutor(max_workers=workers or default_workers()) as executor:
+            for _ in range(max(depth, 1)):
+                children = executor.map(list_child_prefixes, level)
+                level = [child for prefixes in children for child in prefixes]
+                if not level:
+                    break
+                found.extend(level)
+
+        subfolders = sorted(prefix.rstrip("/") for prefix in found)
+        print(json.dumps(subfolders, indent=2))
+        return subfolders
     except Exception as error:
         logging.error(f"Failed to fetch subfolders with error: {error}")
         return []
 
+
 def subfolders_from_parser(args):
-    subfolders(bucket_name=args.bucket)
+    subfolders(bucket_name=args.bucket, depth=args.depth)
 
 
-def get_property(data_list, target_name):
-    matching_dicts = []
+def asset_name(blob_name):
+    """
+    Derive the Earth Engine asset name for a Cloud Storage object name.
 
-    for item in data_list:
-        if "name" in item and target_name.lower() in item["name"].lower():
-            matching_dicts.append(item)
+    Args:
+        blob_name (str): Full object name, e.g. "folder/scene_1.tif".
 
-    return matching_dicts
+    Returns:
+        str: The asset name, e.g. "scene_1".
+    """
+    return blob_name.split("/")[-1].split(".")[0]
 
 
-def register_single_asset(bucket_name, prefix, collection_path, cred, account, asset_id):
-    if cred and account is not None:
-        credentials = ee.ServiceAccountCredentials(account, cred)
-        ee.Initialize(credentials)
-    else:
-        ee.Initialize()
+def parse_shard(value):
+    """
+    Parse a --shard value such as 0/4 into (index, count).
+    """
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected I/N such as 0/4, got {value}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be between 0 and {count - 1}")
+    return index, count
 
-    asset_id_img = f"{collection_path}/{asset_id.get('name').split('/')[-1].split('.')[0]}"
-    created_date = asset_id.get("time_created")
-    updated_date = asset_id.get("time_updated")
-    file_size_bytes = asset_id.get("file_size_bytes")
 
-    if prefix is None:
-        uri = f"gs://{bucket_name}/{asset_id.get('name')}"
-    else:
-        uri = f"gs://{bucket_name}/{prefix}/{asset_id.get('name')}"
+def shard_of(asset_id, count):
+    """
+    Stable shard of an asset ID, the same on every machine and Python version.
+    """
+    digest = hashlib.blake2b(asset_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+
+def in_shard(asset_id, shard):
+    """
+    Whether an asset ID belongs to an (index, count) shard, always True without one.
+    """
+    return shard is None or shard_of(asset_id, shard[1]) == shard[0]
+
 
-    cog_manifest = {
+def unique_by_asset_name(tif_files):
+    """
+    Pair listed .tif files with the asset name they register as.
+
+    When two objects map to the same asset name the first one listed is kept
+    and the collision is logged, since only one of them can be registered.
+
+    Args:
+        tif_files (iterable): Records yielded by list_tif.
+
+    Yields:
+        tuple: (asset name, CogRecord).
+    """
+    seen = {}
+    for item in tif_files:
+        name = asset_name(item.name)
+        if name in seen:
+            logging.warning(
+                f"Skipping {item.name}: asset name {name} already used by {seen[name]}"
+            )
+            continue
+        seen[name] = item.name
+        yield name, item
+
+
+def build_manifest(bucket_name, item):
+    """
+    Build the Earth Engine manifest registering a listed COG.
+
+    Args:
+        bucket_name (str): The name of the Cloud Storage bucket.
+        item (CogRecord): Listed file from list_tif.
+
+    Returns:
+        dict: Manifest for ee.data.createAsset.
+    """
+    properties = {"file_size_bytes": item.size}
+    if item.generation is not None:
+        # Recorded so rewritten objects can be detected with --update-changed
+        properties[GENERATION_PROPERTY] = str(item.generation)
+    return {
         "type": "IMAGE",
-        "gcs_location": {"uris": [uri]},
-        "properties": {"file_size_bytes": file_size_bytes},
-        "startTime": created_date,
-        "endTime": updated_date,
+        "gcs_location": {"uris": [f"gs://{bucket_name}/{item.name}"]},
+        "properties": properties,
+        "startTime": item.time_created,
+        "endTime": item.time_updated,
     }
 
+
+def already_exists(error):
+    """
+    Check whether an Earth Engine error means the asset is already registered.
+
+    Args:
+        error (Exception): The exception raised by ee.data.createAsset.
+
+    Returns:
+        bool: True for ALREADY_EXISTS style errors.
+    """
+    message = str(error).lower()
+    return any(
+        marker in message
+        for marker in ("already_exists", "already exists", "cannot overwrite")
+    )
+
+
+def not_found(error):
+    """
+    Check whether an Earth Engine error means the asset does not exist.
+    """
+    message = str(error).lower()
+    return "not found" in message or "does not exist" in message
+
+
+def register_single_asset(
+    bucket_name,
+    collection_path,
+    session,
+    asset_id,
+    verify_exists=False,
+    retry_policy=None,
+    dead_letter=None,
+    replace=False,
+):
+    asset_id_img = f"{collection_path}/{asset_name(asset_id.name)}"
+    cog_manifest = build_manifest(bucket_name, asset_id)
+    return create_asset(
+        session,
+        asset_id_img,
+        cog_manifest,
+        verify_exists,
+        retry_policy,
+        dead_letter,
+        replace,
+    )
+
+
+def create_asset(
+    session,
+    asset_id_img,
+    cog_manifest,
+    verify_exists=False,
+    retry_policy=None,
+    dead_letter=None,
+    replace=False,
+):
+    """
+    Create one asset from its manifest, the last step of every registration.
+
+    Returns:
+        str: The outcome, registered, updated, skipped or failed.
+    """
+    import ee
+
+    collection_path = asset_id_img.rsplit("/", 1)[0]
+    retry_policy = retry_policy or RetryPolicy()
     try:
-        if ee.data.getInfo(asset_id_img) is not None:
+        # A replaced asset is expected to exist, checking would skip the update
+        if (
+            verify_exists
+            and not replace
+            and retry_policy.call(session.call, ee.data.getInfo, asset_id_img) is not None
+        ):
             print(f"Asset {asset_id_img} already exists: SKIPPING")
-        else:
+            return SKIPPED
+        if replace:
+            # The source object was rewritten, re-register it from scratch
             try:
-                register = ee.data.createAsset(cog_manifest, asset_id_img)
-                if register.get("id") is not None:
-                    logging.info(f"Registered {asset_id_img} to {collection_path}")
+                retry_policy.call(session.call, ee.data.deleteAsset, asset_id_img)
             except Exception as error:
-                print(f"Failed to register {asset_id_img} with error {error}")
-    except ee.ee_exception.EEException:
-        print(f"Failed to register {asset_id_img}")
+                if not not_found(error):
+                    raise
+        register = retry_policy.call(
+            session.call, ee.data.createAsset, cog_manifest, asset_id_img
+        )
+        if replace:
+            logging.info(f"Updated {asset_id_img} in {collection_path}")
+            return UPDATED
+        if register.get("id") is not None:
+            logging.info(f"Registered {asset_id_img} to {collection_path}")
+        return REGISTERED
     except (KeyboardInterrupt, SystemExit) as error:
         sys.exit("Program escaped by User")
+    except Exception as error:
+        if already_exists(error):
+            print(f"Asset {asset_id_img} already exists: SKIPPING")
+            return SKIPPED
+        print(f"Failed to register {asset_id_img} with error {error}")
+        if dead_letter is not None:
+            dead_letter.write(asset_id_img, cog_manifest, error, replace)
+        return FAILED
 
-def register(bucket_name, prefix, collection_path, cred, account, limit):
-    if cred and account is not None:
-        credentials = ee.ServiceAccountCredentials(account, cred)
-        ee.Initialize(credentials)
-    else:
-        ee.Initialize()
+
+def record_outcome(state, asset_id, outcome, uri=None, generation=None):
+    """
+    Keep the registration state in line with the outcome of one asset.
+
+    Args:
+        state (RegistrationState, optional): Nothing is recorded when None.
+        asset_id (str): Full asset ID, collection path and asset name.
+        outcome (str): Outcome returned by create_asset.
+    """
+    if state is None:
+        return
+    collection_path, name = asset_id.rsplit("/", 1)
+    if outcome in (REGISTERED, UPDATED):
+        state.record(collection_path, name, uri, generation)
+    elif outcome == SKIPPED:
+        state.record(collection_path, name)
+
+
+def ensure_collection(session, collection_path, create=True):
+    """
+    Create the target image collection if it does not exist yet.
+
+    Args:
+        session (EESession): Initialized Earth Engine session.
+        collection_path (str): The collection asset path.
+        create (bool): Only check for the collection when False.
+
+    Returns:
+        bool: True if the collection exists.
+    """
+    import ee
 
     try:
-        if ee.data.getAsset(collection_path):
-            print(f"Collection exists: {ee.data.getAsset(collection_path)['id']}")
+        collection = session.call(ee.data.getAsset, collection_path)
+        if collection:
+            print(f"Collection exists: {collection['id']}")
+        return True
     except Exception:
+        if not create:
+            print(f"Collection does not exist: {collection_path}")
+            return False
         print(f"Collection does not exist: Creating {collection_path}")
         try:
-            ee.data.createAsset({"type": ee.data.ASSET_TYPE_IMAGE_COLL_CLOUD}, collection_path)
+            session.call(
+                ee.data.createAsset,
+                {"type": ee.data.ASSET_TYPE_IMAGE_COLL_CLOUD},
+                collection_path,
+            )
         except Exception:
-            ee.data.createAsset({"type": ee.data.ASSET_TYPE_IMAGE_COLL}, collection_path)
-
-    assets_list = ee.data.getList(params={"id": collection_path})
-    gee_asset_list = [os.path.basename(asset["id"]) for asset in assets_list]
-    ptif = list_tif(bucket_name, prefix, limit)
-    gcs_asset_list = [file.get("name").split("/")[-1].split(".tif")[0] for file in ptif]
-    remaining_items = set(gcs_asset_list) - set(gee_asset_list)
-    print(f"Items left to register: {len(remaining_items)}")
-
-    if len(remaining_items) > 0:
-        with ThreadPoolExecutor() as executor:  # Use ThreadPoolExecutor for concurrent execution
-            for i, object in enumerate(list(remaining_items)):
-                asset_id = get_property(ptif, object)[0]
-                executor.submit(register_single_asset, bucket_name, prefix, collection_path, cred, account, asset_id)
-    elif len(remaining_items) == 0:
+            session.call(
+                ee.data.createAsset,
+                {"type": ee.data.ASSET_TYPE_IMAGE_COLL},
+                collection_path,
+            )
+    return True
+
+
+def asset_root_name(asset_path):
+    """
+    Convert an asset ID such as users/me/collection to a Cloud API asset name.
+    """
+    if asset_path.startswith("projects/"):
+        return asset_path
+    return f"projects/earthengine-legacy/assets/{asset_path}"
+
+
+def list_collection(
+    session, collection_path, page_size=10000, stats=None, fields=COLLECTION_FIELDS
+):
+    """
+    Stream the assets of a collection page by page with ee.data.listAssets.
+
+    Only the requested fields of each asset are fetched, by default its name
+    and id.
+
+    Args:
+        session (EESession): Initialized Earth Engine session.
+        collection_path (str): The collection asset path.
+        page_size (int): Number of assets requested per page.
+        stats (Counter, optional): Incremented with the number of pages fetched.
+        fields (str): Partial response field selector.
+
+    Yields:
+        dict: The requested fields of each asset in the collection.
+    """
+    import ee
+
+    params = {
+        "parent": asset_root_name(collection_path),
+        "pageSize": page_size,
+        "fields": fields,
+    }
+    while True:
+        response = session.call(ee.data.listAssets, params)
+        if stats is not None:
+            stats["pages"] += 1
+        yield from response.get("assets", [])
+        token = response.get("nextPageToken")
+        if not token:
+            return
+        params["pageToken"] = token
+
+
+def collection_assets(
+    session, collection_path, state=None, reconcile=False, generations=False
+):
+    """
+    Assets already in a collection, the diff source for register.
+
+    With a registration state the assets come from the local state and Earth
+    Engine is only listed to reconcile it, when asked to or the first time the
+    collection is used. When generations are needed the collection is always
+    listed, since only Earth Engine knows the generation of every asset.
+
+    Args:
+        session (EESession): Initialized Earth Engine session.
+        collection_path (str): The collection asset path.
+        state (RegistrationState, optional): Local registration state.
+        reconcile (bool): Re-sync the state with Earth Engine first.
+        generations (bool): Fetch the source generation of each asset.
+
+    Returns:
+        dict: Asset name, without the collection path, to the generation of
+            its source object as a string, or None when unknown.
+    """
+    if (
+        state is not None
+        and not reconcile
+        and not generations
+        and state.reconciled_at(collection_path)
+    ):
+        assets = state.generations(collection_path)
+        logging.info(f"Using registration state: {len(assets)} assets in {collection_path}")
+        return assets
+
+    assets = dict(collection_generations(session, collection_path, generations))
+    if state is not None:
+        reconcile_state(state, collection_path, assets.items())
+    return assets
+
+
+def collection_generations(session, collection_path, generations=False):
+    """
+    Stream (asset name, generation) pairs for the assets of a collection.
+    """
+    stats = Counter()
+    started = time.monotonic()
+    fields = COLLECTION_GENERATION_FIELDS if generations else COLLECTION_FIELDS
+    for asset in list_collection(session, collection_path, stats=stats, fields=fields):
+        stats["assets"] += 1
+        name = (asset.get("id") or asset["name"]).rsplit("/", 1)[-1]
+        yield name, (asset.get("properties") or {}).get(GENERATION_PROPERTY)
+    logging.info(
+        f"Listed {stats['assets']} assets in {collection_path}: {stats['pages']} pages "
+        f"in {time.monotonic() - started:.1f}s"
+    )
+
+
+def reconcile_state(state, collection_path, assets):
+    added, removed = state.reconcile(collection_path, assets)
+    logging.info(
+        f"Reconciled registration state with {collection_path}: "
+        f"{added} added, {removed} removed"
+    )
+
+
+def sorted_collection_assets(
+    session,
+    collection_path,
+    state=None,
+    reconcile=False,
+    generations=False,
+    spill_dir=None,
+):
+    """
+    Assets already in a collection as a stream sorted by name.
+
+    The bounded-memory counterpart of collection_assets. With a registration
+    state the Earth Engine listing is streamed into the state when needed and
+    read back in name order; without one the listing is sorted externally.
+
+    Returns:
+        iterator: (asset name, generation or None) pairs in name order.
+    """
+    if state is None:
+        return sort_pairs(
+            collection_generations(session, collection_path, generations),
+            tmpdir=spill_dir,
+        )
+    if reconcile or generations or not state.reconciled_at(collection_path):
+        reconcile_state(
+            state,
+            collection_path,
+            collection_generations(session, collection_path, generations),
+        )
+    logging.info(f"Streaming registration state of {collection_path} in name order")
+    return state.iter_generations(collection_path)
+
+
+def start_session(
+    cred,
+    account,
+    workers,
+    qps=None,
+    max_concurrent=None,
+    adaptive=False,
+    deadline=None,
+    cred_pool=None,
+    pool_strategy=LEAST_LOADED,
+):
+    """
+    Initialize Earth Engine once with the rate limits shared by all workers.
+
+    With a credential pool every service account gets its own process, session
+    and rate limits, and workers is the number of threads per account.
+
+    Returns:
+        tuple: (EESession or AccountPool, RateLimiter, AdaptiveConcurrency or None).
+    """
+    if cred_pool:
+        try:
+            accounts = resolve_credentials(cred_pool)
+        except ValueError as error:
+            sys.exit(str(error))
+        pool = AccountPool(
+            accounts,
+            workers,
+            qps=qps,
+            max_concurrent=max_concurrent,
+            adaptive=adaptive,
+            deadline=deadline,
+            strategy=pool_strategy,
+        ).initialize()
+        return pool, pool.limiter, None
+    limiter = RateLimiter(qps=qps, max_concurrent=max_concurrent)
+    controller = None
+    if adaptive:
+        # Start low and let the controller grow towards the worker count
+        controller = AdaptiveConcurrency(
+            limiter, initial=min(max_concurrent or 4, workers), maximum=workers
+        )
+    session = EESession(
+        cred=cred,
+        account=account,
+        limiter=limiter,
+        controller=controller,
+        deadline=deadline,
+    ).initialize()
+    return session, limiter, controller
+
+
+def listing_options(
+    list_shards=1,
+    match_glob=DEFAULT_MATCH_GLOB,
+    inventory_cache=None,
+    refresh_inventory=False,
+    max_inventory_age=None,
+    inventory=None,
+    use_state=False,
+    reconcile=False,
+    state_db=None,
+    update_changed=False,
+    sorted_diff=False,
+    spill_dir=None,
+    shard=None,
+):
+    """
+    Listing and diff options shared by register, plan and --plan-out.
+
+    Returns:
+        dict: The options, passed as listing to the commands.
+    """
+    return {
+        "list_shards": list_shards,
+        "match_glob": match_glob,
+        "inventory_cache": inventory_cache,
+        "refresh_inventory": refresh_inventory,
+        "max_inventory_age": max_inventory_age,
+        "inventory": inventory,
+        "use_state": use_state,
+        "reconcile": reconcile,
+        "state_db": state_db,
+        "update_changed": update_changed,
+        "sorted_diff": sorted_diff,
+        "spill_dir": spill_dir,
+        "shard": shard,
+    }
+
+
+def listing_stores(listing):
+    """
+    Open the inventory cache and the registration state a run asks for.
+
+    Returns:
+        tuple: (InventoryCache or None, RegistrationState or None).
+    """
+    cache = None
+    if listing["refresh_inventory"] or listing["max_inventory_age"] is not None:
+        cache = InventoryCache(listing["inventory_cache"])
+    state = None
+    if listing["use_state"] or listing["reconcile"]:
+        state = RegistrationState(listing["state_db"])
+    return cache, state
+
+
+def remaining_candidates(
+    session,
+    bucket_name,
+    prefix,
+    collection_path,
+    limit,
+    stats,
+    listing,
+    cache=None,
+    state=None,
+    collection_exists=True,
+):
+    """
+    Stream the COGs of a bucket that still have to be registered to a collection.
+
+    The collection is listed first, then the bucket listing is diffed against
+    it as it streams in. Listing counters are added to stats.
+
+    Args:
+        stats (Counter): Receives the listed, existing, other_shards, changed
+            and unknown_generation counts.
+        listing (dict): Options from listing_options().
+        cache (InventoryCache, optional): Opened by listing_stores().
+        state (RegistrationState, optional): Opened by listing_stores().
+        collection_exists (bool): Diff against an empty collection when False.
+
+    Yields:
+        tuple: (CogRecord, replace) for each asset to create or re-register.
+    """
+    sorted_diff = listing["sorted_diff"]
+    spill_dir = listing["spill_dir"]
+    update_changed = listing["update_changed"]
+    shard = listing["shard"]
+
+    def item_asset_name(item):
+        return asset_name(item.name)
+
+    if not collection_exists:
+        gee_asset_list = {}
+        gee_assets = iter(())
+    elif sorted_diff:
+        gee_assets = sorted_collection_assets(
+            session,
+            collection_path,
+            state,
+            listing["reconcile"],
+            generations=update_changed,
+            spill_dir=spill_dir,
+        )
+    else:
+        gee_asset_list = collection_assets(
+            session, collection_path, state, listing["reconcile"], generations=update_changed
+        )
+    if listing["inventory"] is not None:
+        records = read_inventory_reports(listing["inventory"], bucket_name, prefix, limit)
+    else:
+        records = list_inventory(
+            bucket_name,
+            prefix,
+            limit,
+            shards=listing["list_shards"],
+            match_glob=listing["match_glob"],
+            cache=cache,
+            refresh=listing["refresh_inventory"],
+            max_age=listing["max_inventory_age"],
+            # The sort gets presorted runs, the dict diff does not need any order
+            ordered=sorted_diff,
+        )
+    if sorted_diff:
+        # Both sides sorted by asset name, memory does not grow with either
+        matched = sorted_merge(
+            sort_records(records, key=item_asset_name, tmpdir=spill_dir),
+            gee_assets,
+            item_asset_name,
+        )
+    else:
+        matched = (
+            (name, item, gee_asset_list.get(name, MISSING))
+            for name, item in unique_by_asset_name(records)
+        )
+    for name, item, generation in matched:
+        stats["listed"] += 1
+        if not in_shard(f"{collection_path}/{name}", shard):
+            stats["other_shards"] += 1
+            continue
+        if generation is MISSING:
+            yield item, False
+            continue
+        stats["existing"] += 1
+        if not update_changed:
+            continue
+        if generation is None:
+            stats["unknown_generation"] += 1
+        elif item.generation is not None and generation != str(item.generation):
+            stats["changed"] += 1
+            yield item, True
+
+
+def print_listing_summary(stats, listing, cache=None):
+    print(f"Listed {stats['listed']} COGs, {stats['existing']} already in the collection")
+    shard = listing["shard"]
+    if shard is not None:
+        print(f"Shard {shard[0]}/{shard[1]}: {stats['other_shards']} COGs left to other shards")
+    if listing["update_changed"]:
+        print(
+            f"{stats['changed']} changed since they were registered, "
+            f"{stats['unknown_generation']} registered without a source generation"
+        )
+    if cache is not None and cache.hit_ratio() is not None:
+        print(
+            f"Inventory cache: {cache.stats['hits']} unchanged, {cache.stats['misses']} new or changed, "
+            f"{cache.stats['deleted']} removed, hit ratio {cache.hit_ratio():.1%}"
+        )
+
+
+def register(
+    bucket_name,
+    prefix,
+    collection_path,
+    cred,
+    account,
+    limit,
+    verify_exists=False,
+    workers=None,
+    qps=None,
+    max_concurrent=None,
+    adaptive=False,
+    max_attempts=5,
+    deadline=None,
+    dead_letter_path=None,
+    listing=None,
+    journal_path=None,
+    resume=False,
+    cred_pool=None,
+    pool_strategy=LEAST_LOADED,
+):
+    pending = None
+    if resume:
+        if not journal_path:
+            sys.exit("--resume needs the --journal of the interrupted run")
+        try:
+            header, pending, completed, planned = read_journal(journal_path)
+        except FileNotFoundError:
+            sys.exit(f"No journal to resume at {journal_path}")
+        except (OSError, ValueError) as error:
+            sys.exit(f"Could not read journal {journal_path}: {error}")
+        if (header.get("bucket"), header.get("collection")) != (bucket_name, collection_path):
+            sys.exit(
+                f"{journal_path} belongs to a run from gs://{header.get('bucket')} "
+                f"to {header.get('collection')}"
+            )
+        if planned:
+            print(
+                f"Resuming from {journal_path}: {completed} assets done, "
+                f"{len(pending)} left to register"
+            )
+        else:
+            logging.warning(
+                f"The listing of the run in {journal_path} did not finish, listing again"
+            )
+            pending = None
+
+    workers = workers or default_workers()
+    session, limiter, controller = start_session(
+        cred,
+        account,
+        workers,
+        qps,
+        max_concurrent,
+        adaptive,
+        deadline,
+        cred_pool,
+        pool_strategy,
+    )
+    if cred_pool:
+        # Keep every thread of every account busy
+        workers *= len(session)
+    retry_policy = RetryPolicy(max_attempts=max_attempts)
+    dead_letter = DeadLetter(dead_letter_path) if dead_letter_path else None
+    listing = listing or listing_options()
+    cache, state = listing_stores(listing)
+    journal = None
+    if journal_path:
+        journal = Journal(journal_path).start(
+            {"bucket": bucket_name, "prefix": prefix, "collection": collection_path},
+            append=pending is not None,
+        )
+    stats = Counter()
+
+    def journaled(candidates):
+        count = 0
+        for item, replace in candidates:
+            journal.plan(item, replace)
+            count += 1
+            yield item, replace
+        journal.planned(count)
+
+    def register_item(candidate):
+        item, replace = candidate
+        outcome = register_single_asset(
+            bucket_name,
+            collection_path,
+            session,
+            item,
+            verify_exists,
+            retry_policy,
+            dead_letter,
+            replace,
+        )
+        record_outcome(
+            state,
+            f"{collection_path}/{asset_name(item.name)}",
+            outcome,
+            f"gs://{bucket_name}/{item.name}",
+            item.generation,
+        )
+        if journal is not None:
+            journal.outcome(item, outcome)
+        return outcome
+
+    # A resumed run already knows what is left and skips all listing
+    if pending is not None:
+        items = iter(pending)
+    else:
+        ensure_collection(session, collection_path)
+        if listing["sorted_diff"]:
+            print(f"Registering COGs from gs://{bucket_name}/{prefix or ''} once they are sorted")
+        else:
+            print(f"Registering COGs from gs://{bucket_name}/{prefix or ''} as they are listed")
+        items = remaining_candidates(
+            session,
+            bucket_name,
+            prefix,
+            collection_path,
+            limit,
+            stats,
+            listing,
+            cache=cache,
+            state=state,
+        )
+        if journal is not None:
+            items = journaled(items)
+    # list -> filter -> diff runs on the prefetch thread while workers register
+    candidates = Prefetch(items, maxsize=workers * 10)
+    try:
+        outcomes = run_bounded(register_item, candidates, workers=workers)
+    finally:
+        candidates.close()
+        session.close()
+        if state is not None:
+            state.close()
+        if journal is not None:
+            journal.close()
+    if pending is None:
+        print_listing_summary(stats, listing, cache)
+    if sum(outcomes.values()) == 0:
         print("All images already exist in the collection")
+        return
+    print_summary(outcomes, limiter, dead_letter, controller)
+
+
+def plan(
+    bucket_name,
+    prefix,
+    collection_path,
+    queue_path,
+    cred,
+    account,
+    limit,
+    listing=None,
+):
+    """
+    Queue the COGs left to register for cogee worker processes.
+
+    The collection is created if needed so workers only have to create assets.
+    """
+    session, _, _ = start_session(cred, account, default_workers())
+    listing = listing or listing_options()
+    cache, state = listing_stores(listing)
+    stats = Counter()
+    work_queue = WorkQueue(queue_path)
+    try:
+        ensure_collection(session, collection_path)
+        print(f"Queueing COGs from gs://{bucket_name}/{prefix or ''} in {queue_path}")
+        candidates = remaining_candidates(
+            session,
+            bucket_name,
+            prefix,
+            collection_path,
+            limit,
+            stats,
+            listing,
+            cache=cache,
+            state=state,
+        )
+        queued = work_queue.enqueue(bucket_name, collection_path, candidates)
+    finally:
+        session.close()
+        if state is not None:
+            state.close()
+    print_listing_summary(stats, listing, cache)
+    print(f"Queued {queued} assets, {queue_path} holds {work_queue.summary()}")
+
+
+def write_plan(
+    bucket_name,
+    prefix,
+    collection_path,
+    plan_path,
+    cred,
+    account,
+    limit,
+    listing=None,
+):
+    """
+    Write the manifests of the COGs left to register to a plan for cogee apply.
+
+    Nothing is created in Earth Engine, a missing collection is treated as
+    empty and created when the plan is applied.
+    """
+    session, _, _ = start_session(cred, account, default_workers())
+    listing = listing or listing_options()
+    cache, state = listing_stores(listing)
+    stats = Counter()
+    plan_file = PlanWriter(plan_path)
+    try:
+        exists = ensure_collection(session, collection_path, create=False)
+        print(f"Planning COGs from gs://{bucket_name}/{prefix or ''} in {plan_path}")
+        candidates = remaining_candidates(
+            session,
+            bucket_name,
+            prefix,
+            collection_path,
+            limit,
+            stats,
+            listing,
+            cache=cache,
+            state=state,
+            collection_exists=exists,
+        )
+        for item, replace in candidates:
+            plan_file.write(
+                f"{collection_path}/{asset_name(item.name)}",
+                build_manifest(bucket_name, item),
+                replace,
+            )
+    finally:
+        plan_file.close()
+        session.close()
+        if state is not None:
+            state.close()
+    print_listing_summary(stats, listing, cache)
+    print(f"Planned {plan_file.count} assets in {plan_path}, run cogee apply to register them")
+
+
+def print_summary(outcomes, limiter, dead_letter=None, controller=None):
+    print(
+        f"Registration complete: {outcomes[REGISTERED]} registered, "
+        f"{outcomes[UPDATED]} updated, {outcomes[SKIPPED]} skipped, "
+        f"{outcomes[FAILED]} failed"
+    )
+    achieved = limiter.achieved_qps()
+    if achieved is not None:
+        print(f"Earth Engine requests: {limiter.calls} at {achieved:.1f} requests/sec")
+    if dead_letter is not None and dead_letter.count:
+        print(f"Wrote {dead_letter.count} failed assets to {dead_letter.path}")
+    if controller is not None:
+        print(
+            f"Final concurrency: {controller.limit} after {controller.adjustments} adjustments"
+        )
+
+
+def listing_from_parser(args):
+    return listing_options(
+        list_shards=args.list_shards,
+        match_glob=args.match_glob,
+        inventory_cache=args.inventory_cache,
+        refresh_inventory=args.refresh_inventory,
+        max_inventory_age=args.max_inventory_age,
+        inventory=args.inventory,
+        use_state=args.use_state,
+        reconcile=args.reconcile,
+        state_db=args.state_db,
+        update_changed=args.update_changed,
+        sorted_diff=args.sorted_diff,
+        spill_dir=args.spill_dir,
+        shard=args.shard,
+    )
 
 
 def register_from_parser(args):
+    if args.plan_out:
+        if args.resume or args.journal:
+            sys.exit("--plan-out does not register anything and cannot be journaled or resumed")
+        if args.cred_pool:
+            sys.exit("--plan-out lists with a single account, use --cred instead of --cred-pool")
+        write_plan(
+            bucket_name=args.bucket,
+            prefix=args.prefix,
+            collection_path=args.collection,
+            plan_path=args.plan_out,
+            cred=args.cred,
+            account=args.account,
+            limit=args.limit,
+            listing=listing_from_parser(args),
+        )
+        return
     register(
         bucket_name=args.bucket,
         prefix=args.prefix,
@@ -365,12 +1369,452 @@ def register_from_parser(args):
         limit=args.limit,
         cred=args.cred,
         account=args.account,
+        verify_exists=args.verify_exists,
+        workers=args.workers,
+        qps=args.qps,
+        max_concurrent=args.max_concurrent,
+        adaptive=args.adaptive,
+        max_attempts=args.max_attempts,
+        deadline=args.deadline,
+        dead_letter_path=args.dead_letter,
+        journal_path=args.journal,
+        resume=args.resume,
+        cred_pool=args.cred_pool,
+        pool_strategy=args.pool_strategy,
+        listing=listing_from_parser(args),
+    )
+
+
+def plan_from_parser(args):
+    plan(
+        bucket_name=args.bucket,
+        prefix=args.prefix,
+        collection_path=args.collection,
+        queue_path=args.queue,
+        cred=args.cred,
+        account=args.account,
+        limit=args.limit,
+        listing=listing_from_parser(args),
+    )
+
+
+def worker(
+    queue_path,
+    cred,
+    account,
+    verify_exists=False,
+    workers=None,
+    qps=None,
+    max_concurrent=None,
+    adaptive=False,
+    max_attempts=5,
+    deadline=None,
+    dead_letter_path=None,
+    batch_size=None,
+    visibility_timeout=600,
+    poll_interval=5,
+    cred_pool=None,
+    pool_strategy=LEAST_LOADED,
+    use_state=False,
+    state_db=None,
+):
+    """
+    Register the assets queued by cogee plan until the queue is drained.
+
+    Any number of workers can run against the same queue. Each one leases a
+    batch of tasks, registers them with its own thread pool and acks the
+    batch. Tasks leased by a worker that crashed are handed out again once
+    their visibility timeout expires. With use_state the outcomes are
+    recorded in the registration state a later plan --use-state diffs against.
+    """
+    workers = workers or default_workers()
+    session, limiter, controller = start_session(
+        cred,
+        account,
+        workers,
+        qps,
+        max_concurrent,
+        adaptive,
+        deadline,
+        cred_pool,
+        pool_strategy,
+    )
+    if cred_pool:
+        workers *= len(session)
+    batch_size = batch_size or workers * 4
+    retry_policy = RetryPolicy(max_attempts=max_attempts)
+    dead_letter = DeadLetter(dead_letter_path) if dead_letter_path else None
+    work_queue = WorkQueue(queue_path)
+    state = RegistrationState(state_db) if use_state else None
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    outcomes = Counter()
+    collections = set()
+    print(f"Worker {owner} registering assets queued in {queue_path}")
+
+    def register_task(task):
+        outcome = register_single_asset(
+            task.bucket,
+            task.collection,
+            session,
+            task.item,
+            verify_exists,
+            retry_policy,
+            dead_letter,
+            task.replace,
+        )
+        record_outcome(
+            state,
+            f"{task.collection}/{asset_name(task.item.name)}",
+            outcome,
+            f"gs://{task.bucket}/{task.item.name}",
+            task.item.generation,
+        )
+        return task.id, outcome
+
+    try:
+        while True:
+            tasks = work_queue.lease(owner, batch_size, visibility_timeout)
+            if not tasks:
+                expiry = work_queue.next_expiry()
+                if expiry is None:
+                    break
+                # Other workers hold the remaining tasks, wait in case one of them died
+                time.sleep(min(expiry, poll_interval) + 0.1)
+                continue
+            for task in tasks:
+                if task.collection not in collections:
+                    ensure_collection(session, task.collection)
+                    collections.add(task.collection)
+            results = []
+
+            def register_leased(task):
+                task_id, outcome = register_task(task)
+                results.append((task_id, outcome))
+                return outcome
+
+            outcomes.update(run_bounded(register_leased, tasks, workers=workers))
+            work_queue.ack(owner, results)
+    finally:
+        session.close()
+        if state is not None:
+            state.close()
+
+    print(f"Queue drained, {queue_path} holds {work_queue.summary()}")
+    if sum(outcomes.values()):
+        print_summary(outcomes, limiter, dead_letter, controller)
+
+
+def worker_from_parser(args):
+    worker(
+        queue_path=args.queue,
+        cred=args.cred,
+        account=args.account,
+        verify_exists=args.verify_exists,
+        workers=args.workers,
+        qps=args.qps,
+        max_concurrent=args.max_concurrent,
+        adaptive=args.adaptive,
+        max_attempts=args.max_attempts,
+        deadline=args.deadline,
+        dead_letter_path=args.dead_letter,
+        batch_size=args.batch_size,
+        visibility_timeout=args.visibility_timeout,
+        cred_pool=args.cred_pool,
+        pool_strategy=args.pool_strategy,
+        use_state=args.use_state,
+        state_db=args.state_db,
     )
 
+
+def apply(
+    plan_path,
+    cred,
+    account,
+    verify_exists=False,
+    workers=None,
+    qps=None,
+    max_concurrent=None,
+    adaptive=False,
+    max_attempts=5,
+    deadline=None,
+    dead_letter_path=None,
+    shard=None,
+    cred_pool=None,
+    pool_strategy=LEAST_LOADED,
+    use_state=False,
+    state_db=None,
+):
+    """
+    Create the assets of a plan written by register --plan-out.
+
+    Nothing is listed, the plan is streamed straight into the worker pool.
+    Dead-letter files have the same format and can be applied to retry
+    failed assets. With shard several machines can apply one plan. With
+    use_state the outcomes are recorded in the registration state a later
+    register --use-state diffs against.
+    """
+    workers = workers or default_workers()
+    session, limiter, controller = start_session(
+        cred,
+        account,
+        workers,
+        qps,
+        max_concurrent,
+        adaptive,
+        deadline,
+        cred_pool,
+        pool_strategy,
+    )
+    if cred_pool:
+        workers *= len(session)
+    retry_policy = RetryPolicy(max_attempts=max_attempts)
+    dead_letter = DeadLetter(dead_letter_path) if dead_letter_path else None
+    state = RegistrationState(state_db) if use_state else None
+    stats = Counter()
+
+    def planned_assets():
+        collections = set()
+        for asset_id, manifest, replace in read_plan(plan_path):
+            stats["planned"] += 1
+            if not in_shard(asset_id, shard):
+                continue
+            collection_path = asset_id.rsplit("/", 1)[0]
+            if collection_path not in collections:
+                ensure_collection(session, collection_path)
+                collections.add(collection_path)
+            yield asset_id, manifest, replace
+
+    def apply_entry(entry):
+        asset_id, manifest, replace = entry
+        outcome = create_asset(
+            session, asset_id, manifest, verify_exists, retry_policy, dead_letter, replace
+        )
+        generation = manifest.get("properties", {}).get(GENERATION_PROPERTY)
+        record_outcome(
+            state,
+            asset_id,
+            outcome,
+            manifest.get("gcs_location", {}).get("uris", [None])[0],
+            int(generation) if generation is not None else None,
+        )
+        return outcome
+
+    print(f"Applying plan {plan_path}")
+    entries = Prefetch(planned_assets(), maxsize=workers * 10)
+    try:
+        outcomes = run_bounded(apply_entry, entries, workers=workers)
+    finally:
+        entries.close()
+        session.close()
+        if state is not None:
+            state.close()
+    print(f"Read {stats['planned']} planned assets")
+    if sum(outcomes.values()) == 0:
+        print("Nothing to apply")
+        return
+    print_summary(outcomes, limiter, dead_letter, controller)
+
+
+def apply_from_parser(args):
+    apply(
+        plan_path=args.plan,
+        cred=args.cred,
+        account=args.account,
+        verify_exists=args.verify_exists,
+        workers=args.workers,
+        qps=args.qps,
+        max_concurrent=args.max_concurrent,
+        adaptive=args.adaptive,
+        max_attempts=args.max_attempts,
+        deadline=args.deadline,
+        dead_letter_path=args.dead_letter,
+        shard=args.shard,
+        cred_pool=args.cred_pool,
+        pool_strategy=args.pool_strategy,
+        use_state=args.use_state,
+        state_db=args.state_db,
+    )
+
+
+def add_credential_arguments(group):
+    """
+    One service account with --cred and --account, or several with --cred-pool.
+    """
+    accounts = group.add_mutually_exclusive_group()
+    accounts.add_argument(
+        "--cred",
+        help="Path to Credentials.JSON file for service account",
+        default=None,
+    )
+    accounts.add_argument(
+        "--cred-pool",
+        help="Service account key files or folders of key files to spread requests over",
+        nargs="+",
+        default=None,
+    )
+    group.add_argument(
+        "--account",
+        help="Service account email address, not allowed with --cred-pool",
+        default=None,
+    )
+    group.add_argument(
+        "--pool-strategy",
+        help="How requests are spread over --cred-pool accounts",
+        choices=STRATEGIES,
+        default=LEAST_LOADED,
+    )
+
+
+def add_worker_arguments(group):
+    """
+    Options controlling how assets are registered, shared by register, worker and apply.
+    """
+    group.add_argument(
+        "--verify-exists",
+        action="store_true",
+        help="Check each asset with getInfo before creating it (one extra request per asset)",
+    )
+    group.add_argument(
+        "--workers",
+        help="Number of concurrent registration workers",
+        type=int,
+        default=None,
+    )
+    group.add_argument(
+        "--qps",
+        help="Maximum Earth Engine requests per second",
+        type=float,
+        default=None,
+    )
+    group.add_argument(
+        "--max-concurrent",
+        help="Maximum concurrent Earth Engine requests",
+        type=int,
+        default=None,
+    )
+    group.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Adjust concurrency automatically, backing off when Earth Engine throttles",
+    )
+    group.add_argument(
+        "--max-attempts",
+        help="Attempts per asset for quota, server and network errors",
+        type=int,
+        default=5,
+    )
+    group.add_argument(
+        "--deadline",
+        help="Timeout in seconds for each Earth Engine request",
+        type=float,
+        default=None,
+    )
+    group.add_argument(
+        "--dead-letter",
+        help="JSON lines file to record assets that failed to register",
+        default=None,
+    )
+
+
+def add_state_arguments(group):
+    """
+    Options recording outcomes in the registration state, for worker and apply.
+    """
+    group.add_argument(
+        "--use-state",
+        action="store_true",
+        help="Record registered assets in the local registration state used by --use-state listings",
+    )
+    group.add_argument(
+        "--state-db",
+        help="Path of the registration state, defaults to ~/.cache/cogee/registrations.sqlite",
+        default=None,
+    )
+
+
+def add_listing_arguments(group):
+    """
+    Options controlling how the remaining assets are found, shared by register and plan.
+    """
+    group.add_argument(
+        "--list-shards",
+        help="Number of key ranges of the bucket to list concurrently",
+        type=int,
+        default=1,
+    )
+    group.add_argument(
+        "--match-glob",
+        help=f"Glob applied by Cloud Storage when listing, default {DEFAULT_MATCH_GLOB}",
+        default=DEFAULT_MATCH_GLOB,
+    )
+    group.add_argument(
+        "--max-inventory-age",
+        help="Reuse a cached bucket listing younger than this many seconds",
+        type=float,
+        default=None,
+    )
+    group.add_argument(
+        "--refresh-inventory",
+        action="store_true",
+        help="List the bucket and update the local inventory cache",
+    )
+    group.add_argument(
+        "--inventory-cache",
+        help="Path of the local inventory cache, defaults to ~/.cache/cogee/inventory.sqlite",
+        default=None,
+    )
+    group.add_argument(
+        "--inventory",
+        help="Cloud Storage inventory report file or folder (local path or gs:// URI) to read instead of listing the bucket",
+        default=None,
+    )
+    group.add_argument(
+        "--use-state",
+        action="store_true",
+        help="Diff against the local registration state instead of listing the collection",
+    )
+    group.add_argument(
+        "--reconcile",
+        action="store_true",
+        help="Re-sync the local registration state with the collection in Earth Engine",
+    )
+    group.add_argument(
+        "--state-db",
+        help="Path of the registration state, defaults to ~/.cache/cogee/registrations.sqlite",
+        default=None,
+    )
+    group.add_argument(
+        "--update-changed",
+        action="store_true",
+        help="Re-register assets whose source object was rewritten since registration",
+    )
+    group.add_argument(
+        "--sorted-diff",
+        action="store_true",
+        help="Diff bucket and collection as sorted streams, spilling to disk, for very large runs",
+    )
+    group.add_argument(
+        "--spill-dir",
+        help="Directory for sorted runs spilled by --sorted-diff, defaults to the system temp directory",
+        default=None,
+    )
+    group.add_argument(
+        "--shard",
+        help="Only register shard I of N, e.g. 0/4, to split one bucket across machines",
+        type=parse_shard,
+        default=None,
+    )
+
+
 def main(args=None):
     parser = argparse.ArgumentParser(
         description="Simple CLI for COG registration to GEE"
     )
+    parser.add_argument(
+        "--no-version-check",
+        action="store_true",
+        help="Skip the PyPI check for a newer cogee release",
+    )
     subparsers = parser.add_subparsers()
 
     parser_read = subparsers.add_parser(
@@ -404,6 +1848,10 @@ def main(args=None):
     required_named.add_argument(
         "--bucket", help="Google Cloud Project bucket name", required=True
     )
+    optional_named = parser_subfolders.add_argument_group("Optional named arguments")
+    optional_named.add_argument(
+        "--depth", help="Number of folder levels to list", type=int, default=1
+    )
     parser_subfolders.set_defaults(func=subfolders_from_parser)
 
     parser_register = subparsers.add_parser(
@@ -416,7 +1864,48 @@ def main(args=None):
     optional_named = parser_register.add_argument_group("Optional named arguments")
     optional_named.add_argument("--prefix", help="subfolder", default=None)
     optional_named.add_argument(
-        "--limit", help="Max number of assets to register", default=None
+        "--limit", help="Max number of COGs to list from the bucket", default=None
+    )
+    add_credential_arguments(optional_named)
+    add_worker_arguments(optional_named)
+    add_listing_arguments(optional_named)
+    optional_named.add_argument(
+        "--journal",
+        help="Path of a journal recording the plan and outcome of each asset so the run can be resumed",
+        default=None,
+    )
+    optional_named.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume the run recorded in --journal without listing the bucket or collection",
+    )
+    optional_named.add_argument(
+        "--plan-out",
+        help="Write the manifests of the assets left to register to this JSON lines plan instead of registering them",
+        default=None,
+    )
+    required_named.add_argument(
+        "--collection", help="GEE collection path", required=True
+    )
+    parser_register.set_defaults(func=register_from_parser)
+
+    parser_plan = subparsers.add_parser(
+        "plan", help="Queue the COGs left to register for cogee worker"
+    )
+    required_named = parser_plan.add_argument_group("Required named arguments.")
+    required_named.add_argument(
+        "--bucket", help="Google Cloud Project bucket name", required=True
+    )
+    required_named.add_argument(
+        "--collection", help="GEE collection path", required=True
+    )
+    required_named.add_argument(
+        "--queue", help="Path of the SQLite work queue", required=True
+    )
+    optional_named = parser_plan.add_argument_group("Optional named arguments")
+    optional_named.add_argument("--prefix", help="subfolder", default=None)
+    optional_named.add_argument(
+        "--limit", help="Max number of COGs to list from the bucket", default=None
     )
     optional_named.add_argument(
         "--cred",
@@ -428,12 +1917,61 @@ def main(args=None):
         help="Service account email address",
         default=None,
     )
+    add_listing_arguments(optional_named)
+    parser_plan.set_defaults(func=plan_from_parser)
+
+    parser_worker = subparsers.add_parser(
+        "worker", help="Register COGs queued by cogee plan, run as many as needed"
+    )
+    required_named = parser_worker.add_argument_group("Required named arguments.")
     required_named.add_argument(
-        "--collection", help="GEE collection path", required=True
+        "--queue", help="Path of the SQLite work queue", required=True
     )
-    parser_register.set_defaults(func=register_from_parser)
+    optional_named = parser_worker.add_argument_group("Optional named arguments")
+    add_credential_arguments(optional_named)
+    add_worker_arguments(optional_named)
+    optional_named.add_argument(
+        "--batch-size",
+        help="Number of tasks leased at a time, defaults to four per worker thread",
+        type=int,
+        default=None,
+    )
+    optional_named.add_argument(
+        "--visibility-timeout",
+        help="Seconds before the tasks leased by a worker that stopped responding are handed out again",
+        type=float,
+        default=600,
+    )
+    add_state_arguments(optional_named)
+    parser_worker.set_defaults(func=worker_from_parser)
+
+    parser_apply = subparsers.add_parser(
+        "apply", help="Register the assets of a plan written by register --plan-out"
+    )
+    required_named = parser_apply.add_argument_group("Required named arguments.")
+    required_named.add_argument(
+        "--plan", help="Plan or dead-letter JSON lines file", required=True
+    )
+    optional_named = parser_apply.add_argument_group("Optional named arguments")
+    add_credential_arguments(optional_named)
+    add_worker_arguments(optional_named)
+    optional_named.add_argument(
+        "--shard",
+        help="Only apply shard I of N, e.g. 0/4, to split one plan across machines",
+        type=parse_shard,
+        default=None,
+    )
+    add_state_arguments(optional_named)
+    parser_apply.set_defaults(func=apply_from_parser)
 
     args = parser.parse_args()
+    if getattr(args, "cred_pool", None) and args.account:
+        # argparse groups cannot exclude one option from two others
+        parser.error("argument --account: not allowed with argument --cred-pool")
+
+    version_check = None
+    if not version_check_disabled(args.no_version_check):
+        version_check = VersionCheck().start()
 
     try:
         func = args.func
@@ -441,6 +1979,9 @@ def main(args=None):
         parser.error("too few arguments")
     func(args)
 
+    if version_check is not None:
+        version_check.report()
+
 
 if __name__ == "__main__":
     main()
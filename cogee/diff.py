@@ -0,0 +1,150 @@
+__copyright__ = """
+    Copyright 2023-2024 Samapriya Roy
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import heapq
+import json
+import logging
+import tempfile
+
+# Items held in memory per sorted run before spilling to disk
+DEFAULT_CHUNK_SIZE = 200000
+
+MISSING = object()
+
+
+def _spill(chunk, encode, tmpdir):
+    run = tempfile.TemporaryFile(mode="w+", encoding="utf-8", dir=tmpdir)
+    for item in chunk:
+        run.write(encode(item))
+        run.write("\n")
+    run.seek(0)
+    return run
+
+
+def _read(run, decode):
+    for line in run:
+        yield decode(line)
+
+
+def external_sort(items, key, encode, decode, chunk_size=DEFAULT_CHUNK_SIZE, tmpdir=None):
+    """
+    Sort a stream of any size with bounded memory.
+
+    Items are sorted in chunks of chunk_size, each chunk is spilled to a
+    temporary file as a sorted run and the runs are merged lazily. Inputs that
+    fit in a single chunk never touch the disk. The whole input is consumed
+    before the first item is yielded.
+
+    Args:
+        items (iterable): Items to sort.
+        key (callable): Sort key.
+        encode (callable): Serializes an item to a single line of text.
+        decode (callable): Restores an item from its line of text.
+        chunk_size (int): Maximum items held in memory at once.
+        tmpdir (str, optional): Directory for the spilled runs.
+
+    Yields:
+        The items in key order.
+    """
+    runs = []
+    chunk = []
+    try:
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                chunk.sort(key=key)
+                runs.append(_spill(chunk, encode, tmpdir))
+                chunk = []
+        chunk.sort(key=key)
+        if not runs:
+            yield from chunk
+            return
+        runs.append(_spill(chunk, encode, tmpdir))
+        chunk = []
+        logging.info(f"Merging {len(runs)} sorted runs spilled to disk")
+        yield from heapq.merge(*(_read(run, decode) for run in runs), key=key)
+    finally:
+        for run in runs:
+            run.close()
+
+
+def sort_records(records, key, chunk_size=DEFAULT_CHUNK_SIZE, tmpdir=None):
+    """
+    Externally sort CogRecords by key.
+    """
+    from .inventory import CogRecord
+
+    return external_sort(
+        records,
+        key=key,
+        encode=lambda r: json.dumps(r.astuple()),
+        decode=lambda line: CogRecord(*json.loads(line)),
+        chunk_size=chunk_size,
+        tmpdir=tmpdir,
+    )
+
+
+def sort_pairs(pairs, chunk_size=DEFAULT_CHUNK_SIZE, tmpdir=None):
+    """
+    Externally sort (name, value) pairs by name.
+    """
+    return external_sort(
+        pairs,
+        key=lambda pair: pair[0],
+        encode=json.dumps,
+        decode=lambda line: tuple(json.loads(line)),
+        chunk_size=chunk_size,
+        tmpdir=tmpdir,
+    )
+
+
+def sorted_merge(left, right, left_key):
+    """
+    Match a sorted stream of items against a sorted stream of (key, value) pairs.
+
+    Both streams must be sorted by key. Only one item per key is kept from the
+    left stream, later duplicates are logged and dropped. Memory use does not
+    depend on the size of either stream.
+
+    Args:
+        left (iterable): Items sorted by left_key.
+        right (iterable): (key, value) pairs sorted by key.
+        left_key (callable): Key of a left item.
+
+    Yields:
+        tuple: (key, item, value) for each distinct left key, value is MISSING
+            when the key is not in the right stream.
+    """
+    right = iter(right)
+    current = next(right, None)
+    previous = None
+    try:
+        for item in left:
+            key = left_key(item)
+            if previous is not None and key == previous[0]:
+                logging.warning(
+                    f"Skipping {item.name}: asset name {key} already used by {previous[1].name}"
+                )
+                continue
+            previous = (key, item)
+            while current is not None and current[0] < key:
+                current = next(right, None)
+            if current is not None and current[0] == key:
+                yield key, item, current[1]
+            else:
+                yield key, item, MISSING
+    finally:
+        # Release spilled runs or database cursors held by the right stream
+        if hasattr(right, "close"):
+            right.close()
@@ -0,0 +1,469 @@
+__copyright__ = """
+    Copyright 2023-2024 Samapriya Roy
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import csv
+import io
+import logging
+import os
+import re
+import sqlite3
+import time
+from collections import Counter
+from contextlib import closing
+from datetime import datetime, timezone
+
+
+def format_time(epoch):
+    """
+    Format epoch seconds as the UTC timestamp used in Earth Engine manifests.
+    """
+    if epoch is None:
+        return None
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch))
+
+
+def to_epoch(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        # Naive timestamps, as written to Parquet reports, are in UTC
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+class CogRecord:
+    """
+    A listed COG in Cloud Storage.
+
+    Records hold plain integers instead of datetimes and use __slots__, since
+    millions of them can be alive during a run. Timestamps are only formatted
+    when a manifest is built.
+
+    Args:
+        name (str): Full object name in the bucket.
+        size (int): Object size in bytes.
+        created (int): Creation time in epoch seconds.
+        updated (int): Last update time in epoch seconds.
+        generation (int, optional): Object generation.
+    """
+
+    __slots__ = ("name", "size", "created", "updated", "generation")
+
+    def __init__(self, name, size, created, updated, generation=None):
+        self.name = name
+        self.size = size
+        self.created = created
+        self.updated = updated
+        self.generation = generation
+
+    @classmethod
+    def from_blob(cls, blob):
+        return cls(
+            blob.name,
+            blob.size,
+            to_epoch(blob.time_created),
+            to_epoch(blob.updated),
+            blob.generation,
+        )
+
+    def astuple(self):
+        return (self.name, self.size, self.created, self.updated, self.generation)
+
+    @property
+    def time_created(self):
+        return format_time(self.created)
+
+    @property
+    def time_updated(self):
+        return format_time(self.updated)
+
+    def __repr__(self):
+        return f"CogRecord({self.name!r}, size={self.size}, generation={self.generation})"
+
+
+def cache_dir():
+    """
+    Directory for cogee's local caches, honouring XDG_CACHE_HOME.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "cogee")
+
+
+class InventoryCache:
+    """
+    On-disk SQLite cache of Cloud Storage listings.
+
+    Each listing is keyed by bucket, prefix and match glob and stores the name,
+    size, times and generation of every listed COG. A listing younger than the
+    allowed age can be reused without touching Cloud Storage, and refreshing a
+    listing only writes the objects that were added or changed since.
+
+    Args:
+        path (str, optional): SQLite file, defaults to inventory.sqlite in the
+            cogee cache directory.
+    """
+
+    # stays below SQLite's default limit of 999 bound parameters
+    BATCH_SIZE = 500
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(cache_dir(), "inventory.sqlite")
+        self.stats = Counter()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS listings (
+                    id INTEGER PRIMARY KEY,
+                    bucket TEXT NOT NULL,
+                    prefix TEXT NOT NULL,
+                    match_glob TEXT NOT NULL,
+                    refreshed_at REAL,
+                    UNIQUE (bucket, prefix, match_glob)
+                );
+                CREATE TABLE IF NOT EXISTS objects (
+                    listing INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    size INTEGER,
+                    created INTEGER,
+                    updated INTEGER,
+                    generation INTEGER,
+                    run INTEGER,
+                    PRIMARY KEY (listing, name)
+                ) WITHOUT ROWID;
+                """
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _listing_id(self, conn, bucket, prefix, match_glob):
+        key = (bucket, prefix or "", match_glob or "")
+        conn.execute(
+            "INSERT OR IGNORE INTO listings (bucket, prefix, match_glob) VALUES (?, ?, ?)",
+            key,
+        )
+        return conn.execute(
+            "SELECT id FROM listings WHERE bucket = ? AND prefix = ? AND match_glob = ?",
+            key,
+        ).fetchone()[0]
+
+    def age(self, bucket, prefix, match_glob):
+        """
+        Seconds since the listing was last fully refreshed, None if never.
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT refreshed_at FROM listings WHERE bucket = ? AND prefix = ? AND match_glob = ?",
+                (bucket, prefix or "", match_glob or ""),
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return time.time() - row[0]
+
+    def records(self, bucket, prefix, match_glob):
+        """
+        Yield the cached records of a listing in name order.
+        """
+        conn = self._connect()
+        try:
+            listing = self._listing_id(conn, bucket, prefix, match_glob)
+            cursor = conn.execute(
+                "SELECT name, size, created, updated, generation FROM objects "
+                "WHERE listing = ? ORDER BY name",
+                (listing,),
+            )
+            for row in cursor:
+                self.stats["hits"] += 1
+                yield CogRecord(*row)
+        finally:
+            conn.close()
+
+    def refresh(self, bucket, prefix, match_glob, records, complete=True):
+        """
+        Pass live listing records through while updating the cache.
+
+        Records whose generation is unchanged count as cache hits and are only
+        marked as seen. New or changed records are written. When the listing
+        ran to completion, cached objects that were not seen are deleted and
+        the listing is marked as refreshed.
+
+        Args:
+            records (iterable): CogRecords from a live listing.
+            complete (bool): False when the listing is known to be partial,
+                for example because of --limit.
+
+        Yields:
+            CogRecord: The live records, unchanged.
+        """
+        conn = self._connect()
+        listing = self._listing_id(conn, bucket, prefix, match_glob)
+        run = time.time_ns()
+        batch = []
+        exhausted = False
+        try:
+            for record in records:
+                batch.append(record)
+                if len(batch) >= self.BATCH_SIZE:
+                    self._write_batch(conn, listing, run, batch)
+                    batch = []
+                yield record
+            exhausted = True
+        finally:
+            if batch:
+                self._write_batch(conn, listing, run, batch)
+            if exhausted and complete:
+                deleted = conn.execute(
+                    "DELETE FROM objects WHERE listing = ? AND run != ?",
+                    (listing, run),
+                ).rowcount
+                self.stats["deleted"] += deleted
+                conn.execute(
+                    "UPDATE listings SET refreshed_at = ? WHERE id = ?",
+                    (time.time(), listing),
+                )
+            conn.commit()
+            conn.close()
+
+    def _write_batch(self, conn, listing, run, batch):
+        placeholders = ",".join("?" * len(batch))
+        cached = dict(
+            conn.execute(
+                f"SELECT name, generation FROM objects WHERE listing = ? AND name IN ({placeholders})",
+                [listing] + [record.name for record in batch],
+            )
+        )
+        unchanged = []
+        changed = []
+        for record in batch:
+            if record.name in cached and cached[record.name] == record.generation:
+                unchanged.append((run, listing, record.name))
+            else:
+                changed.append(
+                    (
+                        listing,
+                        record.name,
+                        record.size,
+                        record.created,
+                        record.updated,
+                        record.generation,
+                        run,
+                    )
+                )
+        conn.executemany(
+            "UPDATE objects SET run = ? WHERE listing = ? AND name = ?", unchanged
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?, ?)", changed
+        )
+        conn.commit()
+        self.stats["hits"] += len(unchanged)
+        self.stats["misses"] += len(changed)
+
+    def hit_ratio(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        if not total:
+            return None
+        return self.stats["hits"] / total
+
+
+TIF_EXTENSIONS = (".tif", ".tiff")
+REPORT_EXTENSIONS = (".csv", ".parquet")
+REPORT_COLUMNS = ["bucket", "name", "size", "timeCreated", "updated", "generation", "timeDeleted"]
+REPORT_BATCH_SIZE = 10000
+
+
+# Fractional seconds are dropped, older Pythons only parse 3 or 6 digits
+FRACTION = re.compile(r"\.\d+")
+# Report shards are named <report config>_<snapshot time>_<shard>.<extension>
+SHARD_SUFFIX = re.compile(r"_\d+$")
+
+
+def parse_rfc3339(value):
+    """
+    Convert an RFC 3339 timestamp such as 2023-07-31T21:18:48.812Z or
+    2023-07-31T21:18:48+00:00 to epoch seconds, None if it cannot be parsed.
+    """
+    if not value:
+        return None
+    if not isinstance(value, str):
+        # Parquet reports carry native timestamps
+        return to_epoch(value)
+    try:
+        parsed = datetime.fromisoformat(FRACTION.sub("", value, count=1).replace("Z", "+00:00"))
+    except ValueError:
+        logging.warning(f"Ignoring invalid timestamp {value!r} in inventory report")
+        return None
+    return to_epoch(parsed)
+
+
+def to_int(value):
+    if value in (None, ""):
+        return None
+    return int(value)
+
+
+def snapshot_of(path):
+    """
+    Key shared by the shards of one inventory report snapshot.
+    """
+    folder, filename = os.path.split(path)
+    stem = os.path.splitext(filename)[0]
+    return folder, SHARD_SUFFIX.sub("", stem)
+
+
+def newest_snapshot(files, source):
+    """
+    Keep the files of the most recently written snapshot.
+
+    Args:
+        files (list): (path, modification time in epoch seconds) tuples.
+        source (str): The folder the files were found in, for logging.
+
+    Returns:
+        list: Sorted paths of the newest snapshot's report files.
+    """
+    snapshots = {}
+    for path, modified in files:
+        snapshots.setdefault(snapshot_of(path), []).append((path, modified or 0))
+    if not snapshots:
+        return []
+    key = max(snapshots, key=lambda key: max(modified for _, modified in snapshots[key]))
+    if len(snapshots) > 1:
+        logging.info(
+            f"Reading the newest of {len(snapshots)} inventory snapshots in {source}: {key[1]}"
+        )
+    return sorted(path for path, _ in snapshots[key])
+
+
+def report_files(source):
+    """
+    Resolve an inventory report source to an ordered list of report files.
+
+    Storage Insights writes a new snapshot of the whole bucket on every
+    scheduled run, so a folder only contributes the shards of its most
+    recently written snapshot. Pass a report file to read an older one.
+
+    Args:
+        source (str): A local file or directory, or a gs:// URI of a report
+            file or of the folder holding the reports.
+
+    Returns:
+        list: Local paths or gs:// URIs of .csv and .parquet report files.
+    """
+    if source.startswith("gs://"):
+        from google.cloud import storage
+
+        bucket_name, _, path = source[len("gs://"):].partition("/")
+        if path.lower().endswith(REPORT_EXTENSIONS):
+            return [source]
+        blobs = storage.Client().list_blobs(bucket_name, prefix=path)
+        return newest_snapshot(
+            [
+                (f"gs://{bucket_name}/{blob.name}", to_epoch(blob.updated))
+                for blob in blobs
+                if blob.name.lower().endswith(REPORT_EXTENSIONS)
+            ],
+            source,
+        )
+    if os.path.isdir(source):
+        files = []
+        for root, _, filenames in os.walk(source):
+            for filename in filenames:
+                if filename.lower().endswith(REPORT_EXTENSIONS):
+                    path = os.path.join(root, filename)
+                    files.append((path, os.path.getmtime(path)))
+        return newest_snapshot(files, source)
+    return [source]
+
+
+def open_report(path):
+    """
+    Open a report file for binary streaming reads, locally or from Cloud Storage.
+    """
+    if path.startswith("gs://"):
+        from google.cloud import storage
+
+        bucket_name, _, name = path[len("gs://"):].partition("/")
+        return storage.Client().bucket(bucket_name).blob(name).open("rb")
+    return open(path, "rb")
+
+
+def report_rows(path):
+    """
+    Stream the rows of one CSV or Parquet inventory report as dictionaries.
+    """
+    with open_report(path) as f:
+        if path.lower().endswith(".parquet"):
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError(
+                    "Reading Parquet inventory reports requires pyarrow: pip install cogee[parquet]"
+                )
+
+            report = pq.ParquetFile(f)
+            columns = [c for c in REPORT_COLUMNS if c in report.schema_arrow.names]
+            for batch in report.iter_batches(batch_size=REPORT_BATCH_SIZE, columns=columns):
+                yield from batch.to_pylist()
+        else:
+            yield from csv.DictReader(io.TextIOWrapper(f, encoding="utf-8", newline=""))
+
+
+def read_inventory_reports(source, bucket_name, prefix=None, limit=None):
+    """
+    Stream candidate COGs from Cloud Storage inventory reports.
+
+    Reports are read row by row (Parquet in record batches), so memory use
+    does not depend on the size of the reports.
+
+    Args:
+        source (str): Report file, folder or gs:// URI, see report_files.
+        bucket_name (str): Only objects of this bucket are returned.
+        prefix (str, optional): Only objects under this prefix are returned.
+        limit (int, optional): Stop after this many .tif files.
+
+    Yields:
+        CogRecord: Each matching .tif file found in the reports.
+    """
+    found = 0
+    files = report_files(source)
+    logging.info(f"Reading {len(files)} inventory report files from {source}")
+    for path in files:
+        for row in report_rows(path):
+            name = row.get("name")
+            if not name or not name.lower().endswith(TIF_EXTENSIONS):
+                continue
+            if row.get("bucket") and row["bucket"] != bucket_name:
+                continue
+            if prefix and not name.startswith(prefix):
+                continue
+            if row.get("timeDeleted"):
+                continue
+            yield CogRecord(
+                name,
+                to_int(row.get("size")),
+                parse_rfc3339(row.get("timeCreated")),
+                parse_rfc3339(row.get("updated")),
+                to_int(row.get("generation")),
+            )
+            found += 1
+            if limit is not None and found >= int(limit):
+                return
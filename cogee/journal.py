@@ -0,0 +1,156 @@
+__copyright__ = """
+    Copyright 2023-2024 Samapriya Roy
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import json
+import logging
+import os
+import threading
+import time
+
+from .inventory import CogRecord
+
+# Outcomes that do not need to be redone on resume
+COMPLETED = ("registered", "updated", "skipped")
+
+
+class Journal:
+    """
+    Append only JSON lines journal of a register run.
+
+    The journal holds a header describing the run, one plan line per asset
+    queued for registration, a line marking the end of the plan once the
+    listing has finished and one line per asset outcome. Lines are buffered
+    and written in batches, and fsync is only called every fsync_interval
+    seconds, so journaling never holds up the workers. A crash loses at most
+    the last few seconds of outcomes, and those assets are simply registered
+    again (already existing assets are skipped).
+
+    Args:
+        path (str): Path of the journal file.
+        flush_every (int): Number of buffered lines that triggers a write.
+        flush_interval (float): Maximum seconds a line stays buffered.
+        fsync_interval (float): Minimum seconds between two fsync calls.
+    """
+
+    def __init__(self, path, flush_every=1000, flush_interval=1.0, fsync_interval=5.0):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._file = None
+        self._flushed_at = time.monotonic()
+        self._synced_at = time.monotonic()
+
+    def start(self, run, append=False):
+        """
+        Open the journal, a new run truncates it and writes its header.
+
+        Args:
+            run (dict): Bucket, prefix and collection of the run.
+            append (bool): Continue an existing journal when resuming.
+        """
+        self._file = open(self.path, "a" if append else "w", encoding="utf-8")
+        if append and self._file.tell() and not _ends_with_newline(self.path):
+            # Terminate a line left incomplete by a crash before appending
+            self._file.write("\n")
+        if not append:
+            self._append({"op": "start", "started_at": time.time(), **run})
+        return self
+
+    def plan(self, item, replace=False):
+        self._append({"op": "plan", "item": item.astuple(), "replace": replace})
+
+    def planned(self, count):
+        self._append({"op": "planned", "count": count})
+
+    def outcome(self, item, outcome):
+        self._append({"op": "done", "name": item.name, "outcome": outcome})
+
+    def _append(self, record):
+        with self._lock:
+            self._buffer.append(json.dumps(record))
+            if (
+                len(self._buffer) >= self.flush_every
+                or time.monotonic() - self._flushed_at >= self.flush_interval
+            ):
+                self._flush()
+
+    def _flush(self, sync=False):
+        if self._buffer:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._buffer = []
+        self._file.flush()
+        self._flushed_at = time.monotonic()
+        if sync or self._flushed_at - self._synced_at >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._synced_at = self._flushed_at
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._flush(sync=True)
+                self._file.close()
+                self._file = None
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def read_journal(path):
+    """
+    Replay a journal to find the assets a run still has to register.
+
+    A line left incomplete by a crash is ignored. Assets whose last outcome
+    is failed are retried.
+
+    Args:
+        path (str): Path of the journal file.
+
+    Returns:
+        tuple: (run header dict, list of pending (CogRecord, replace) tuples,
+            number of completed assets, whether the plan was complete).
+    """
+    header = None
+    plan = {}
+    done = set()
+    complete = False
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logging.warning(f"Ignoring incomplete journal line in {path}")
+                continue
+            op = record.get("op")
+            if op == "start":
+                header = record
+            elif op == "plan":
+                item = CogRecord(*record["item"])
+                plan[item.name] = (item, record.get("replace", False))
+            elif op == "planned":
+                complete = True
+            elif op == "done":
+                if record["outcome"] in COMPLETED:
+                    done.add(record["name"])
+                else:
+                    done.discard(record["name"])
+    if header is None:
+        raise ValueError(f"{path} is not a cogee register journal")
+    pending = [entry for name, entry in plan.items() if name not in done]
+    return header, pending, len(plan) - len(pending), complete
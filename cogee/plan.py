@@ -0,0 +1,65 @@
+__copyright__ = """
+    Copyright 2023-2024 Samapriya Roy
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import json
+import logging
+
+
+class PlanWriter:
+    """
+    JSON lines file of the assets a register run would create.
+
+    Each line holds the asset ID, its manifest and whether an existing asset
+    is replaced, the same fields as a dead-letter file, so failed assets can
+    be re-applied like any other plan.
+
+    Args:
+        path (str): Path of the plan file, overwritten if it exists.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, asset_id, manifest, replace=False):
+        record = {"asset_id": asset_id, "manifest": manifest, "replace": replace}
+        self._file.write(json.dumps(record) + "\n")
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+def read_plan(path):
+    """
+    Stream the entries of a plan or dead-letter file.
+
+    Args:
+        path (str): Path of the JSON lines file.
+
+    Yields:
+        tuple: (asset ID, manifest, replace).
+    """
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                entry = (record["asset_id"], record["manifest"], record.get("replace", False))
+            except (ValueError, KeyError, TypeError):
+                logging.warning(f"Skipping invalid line {number} of {path}")
+                continue
+            yield entry
@@ -0,0 +1,197 @@
+__copyright__ = """
+    Copyright 2023-2024 Samapriya Roy
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import logging
+import os
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+REGISTERED = "registered"
+SKIPPED = "skipped"
+UPDATED = "updated"
+FAILED = "failed"
+
+_DONE = object()
+
+
+def default_workers():
+    """
+    Default worker count, matching the ThreadPoolExecutor default.
+    """
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def run_bounded(func, items, workers=None, max_in_flight=None):
+    """
+    Run func over items on a thread pool with a bounded number of pending tasks.
+
+    Items are pulled lazily and a new task is only submitted once a slot frees
+    up, so memory stays flat no matter how many items there are.
+
+    Args:
+        func (callable): Called with each item, returns an outcome string.
+        items (iterable): Items to process, consumed lazily.
+        workers (int, optional): Number of worker threads.
+        max_in_flight (int, optional): Maximum submitted but unfinished tasks,
+            defaults to twice the number of workers.
+
+    Returns:
+        Counter: Number of tasks per outcome.
+    """
+    workers = workers or default_workers()
+    max_in_flight = max_in_flight or workers * 2
+    outcomes = Counter()
+
+    def collect(done):
+        for future in done:
+            try:
+                outcomes[future.result()] += 1
+            except Exception as error:
+                logging.error(f"Task failed with error {error}")
+                outcomes[FAILED] += 1
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for item in items:
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(func, item))
+        collect(wait(pending).done)
+    return outcomes
+
+
+class _Raised:
+    def __init__(self, error):
+        self.error = error
+
+
+class Prefetch:
+    """
+    Consume an iterable on a background thread through a bounded queue.
+
+    The producer thread starts as soon as the object is created, which lets a
+    slow producer such as a paginated listing keep running while the consumer
+    is busy without ever buffering more than maxsize items. Errors raised by
+    the producer are re-raised in the consumer. Call close() to stop the
+    producer early.
+
+    Args:
+        iterable (iterable): Items to produce.
+        maxsize (int): Maximum number of buffered items.
+    """
+
+    def __init__(self, iterable, maxsize=1000):
+        self._iterable = iterable
+        self._buffer = queue.Queue(maxsize)
+        self._stopped = threading.Event()
+        self._finished = False
+        self._producer = threading.Thread(
+            target=self._produce, name="cogee-prefetch", daemon=True
+        )
+        self._producer.start()
+
+    def _put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self._buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        try:
+            for item in self._iterable:
+                if not self._put(item):
+                    return
+        except Exception as error:
+            self._put(_Raised(error))
+            return
+        self._put(_DONE)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._finished:
+            raise StopIteration
+        item = self._buffer.get()
+        if item is _DONE:
+            self._finished = True
+            raise StopIteration
+        if isinstance(item, _Raised):
+            self.close()
+            raise item.error
+        return item
+
+    def close(self):
+        self._finished = True
+        self._stopped.set()
+
+
+class Interleave(Prefetch):
+    """
+    Consume several iterables concurrently through one bounded queue.
+
+    Every iterable gets its own producer thread, and items are yielded in the
+    order they arrive, so a slow or long iterable never holds up the others.
+    Items of one iterable keep their order, items of different iterables are
+    interleaved. Errors raised by any producer are re-raised in the consumer.
+
+    Args:
+        iterables (list): Iterables to produce.
+        maxsize (int): Maximum number of buffered items over all iterables.
+    """
+
+    def __init__(self, iterables, maxsize=1000):
+        self._buffer = queue.Queue(maxsize)
+        self._stopped = threading.Event()
+        self._finished = False
+        self._running = len(iterables)
+        self._producers = [
+            threading.Thread(
+                target=self._produce, args=(iterable,), name="cogee-interleave", daemon=True
+            )
+            for iterable in iterables
+        ]
+        for producer in self._producers:
+            producer.start()
+
+    def _produce(self, iterable):
+        try:
+            for item in iterable:
+                if not self._put(item):
+                    return
+        except Exception as error:
+            self._put(_Raised(error))
+            return
+        self._put(_DONE)
+
+    def __next__(self):
+        while not self._finished:
+            if self._running == 0:
+                self._finished = True
+                break
+            item = self._buffer.get()
+            if item is _DONE:
+                self._running -= 1
+                continue
+            if isinstance(item, _Raised):
+                self.close()
+                raise item.error
+            return item
+        raise StopIteration
@@ -0,0 +1,135 @@
+__copyright__ = """
+    Copyright 2023-2024 Samapriya Roy
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import json
+import logging
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+
+from .throttle import is_throttled
+
+TRANSIENT_MARKERS = (
+    "connection reset",
+    "connection aborted",
+    "connection refused",
+    "broken pipe",
+    "timed out",
+    "timeout",
+    "deadline exceeded",
+    "temporarily",
+    "refresherror",
+    "failed to refresh",
+)
+
+
+def is_retriable(error):
+    """
+    Classify an error from an Earth Engine request as transient or permanent.
+
+    Quota, 429 and 5xx errors, dropped connections, timeouts and token refresh
+    failures are worth retrying. Anything else (invalid manifest, permission
+    denied, already exists) will fail the same way again.
+
+    Args:
+        error (Exception): Error raised by the request.
+
+    Returns:
+        bool: True if the request should be retried.
+    """
+    if isinstance(error, (ConnectionError, TimeoutError, socket.timeout)):
+        return True
+    if type(error).__name__ == "RefreshError":
+        return True
+    if is_throttled(error):
+        return True
+    message = f"{type(error).__name__}: {error}".lower()
+    return any(marker in message for marker in TRANSIENT_MARKERS)
+
+
+class RetryPolicy:
+    """
+    Retry transient errors with exponential backoff and full jitter.
+
+    Args:
+        max_attempts (int): Total attempts including the first one.
+        base_delay (float): Backoff in seconds before the second attempt.
+        max_delay (float): Upper bound on the backoff between attempts.
+    """
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=60.0):
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call func, retrying transient errors until max_attempts is reached.
+
+        The last error is re-raised with an attempts attribute recording how
+        many times the call was made.
+        """
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as error:
+                if attempt >= self.max_attempts or not is_retriable(error):
+                    error.attempts = attempt
+                    raise
+                delay = self.backoff(attempt)
+                logging.warning(
+                    f"Attempt {attempt}/{self.max_attempts} failed with error {error}, retrying in {delay:.1f}s"
+                )
+                time.sleep(delay)
+                attempt += 1
+
+
+class DeadLetter:
+    """
+    Append only JSON lines file of assets that could not be registered.
+
+    Each line holds the asset ID, manifest and whether an existing asset is
+    replaced, the same fields as a plan, so the assets can be re-driven with
+    cogee apply, along with the error and whether it was transient.
+
+    Args:
+        path (str): Path of the dead-letter file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def write(self, asset_id, manifest, error, replace=False):
+        record = {
+            "asset_id": asset_id,
+            "manifest": manifest,
+            "replace": replace,
+            "error": str(error),
+            "retriable": is_retriable(error),
+            "attempts": getattr(error, "attempts", 1),
+            "failed_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+            self.count += 1
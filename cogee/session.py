@@ -0,0 +1,141 @@
+__copyright__ = """
+    Copyright 2023-2024 Samapriya Roy
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import datetime
+import logging
+import threading
+import time
+
+from .throttle import RateLimiter, is_throttled
+
+
+class EESession:
+    """
+    A process wide Earth Engine session shared by registration workers.
+
+    Credentials are loaded and Earth Engine is initialized exactly once. Workers
+    call ensure_fresh() before issuing RPCs so the access token is refreshed
+    by a single thread ahead of expiry instead of by every request racing on it.
+    This applies to service account credentials; without --cred the Earth Engine
+    client refreshes the persistent credentials it loaded itself.
+
+    Args:
+        cred (str, optional): Path to the service account credentials JSON file.
+        account (str, optional): Service account email address.
+        refresh_margin (int): Seconds before token expiry at which to refresh.
+        limiter (RateLimiter, optional): Limiter applied to every call().
+        controller (AdaptiveConcurrency, optional): Fed with the latency and
+            throttling errors of every call().
+        deadline (float, optional): Timeout in seconds for each request.
+    """
+
+    def __init__(
+        self,
+        cred=None,
+        account=None,
+        refresh_margin=300,
+        limiter=None,
+        controller=None,
+        deadline=None,
+    ):
+        self.cred = cred
+        self.account = account
+        self.limiter = limiter or RateLimiter()
+        self.controller = controller
+        self.deadline = deadline
+        self.refresh_margin = datetime.timedelta(seconds=refresh_margin)
+        self.credentials = None
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def initialize(self):
+        """
+        Load credentials and initialize Earth Engine if not already done.
+
+        Returns:
+            EESession: The session itself so it can be chained on creation.
+        """
+        import ee
+
+        with self._lock:
+            if self._initialized:
+                return self
+            if self.cred and self.account is not None:
+                self.credentials = ee.ServiceAccountCredentials(self.account, self.cred)
+                ee.Initialize(self.credentials)
+            else:
+                # The client loads and refreshes its own persistent credentials
+                ee.Initialize()
+            if self.deadline:
+                ee.data.setDeadline(int(self.deadline * 1000))
+            self._initialized = True
+        return self
+
+    def _needs_refresh(self):
+        expiry = getattr(self.credentials, "expiry", None)
+        if not getattr(self.credentials, "token", None) or expiry is None:
+            return False
+        # google-auth stores expiry as a naive UTC datetime
+        now = datetime.datetime.utcnow()
+        return expiry - now <= self.refresh_margin
+
+    def ensure_fresh(self):
+        """
+        Refresh the access token if it is about to expire.
+
+        Only one thread performs the refresh; the others see the new token once
+        the lock is released.
+        """
+        if not self._initialized:
+            self.initialize()
+        if self.credentials is None or not self._needs_refresh():
+            return
+        with self._lock:
+            if not self._needs_refresh():
+                return
+            from google.auth.transport.requests import Request
+
+            try:
+                self.credentials.refresh(Request())
+                logging.info("Refreshed Earth Engine access token")
+            except Exception as error:
+                logging.warning(f"Failed to refresh Earth Engine access token: {error}")
+
+    def close(self):
+        """
+        Nothing to release, Earth Engine state lives for the whole process.
+        """
+
+    def call(self, func, *args, **kwargs):
+        """
+        Issue an Earth Engine request through this session's rate limiter.
+
+        Args:
+            func (callable): An ee.data function, e.g. ee.data.createAsset.
+
+        Returns:
+            The result of func(*args, **kwargs).
+        """
+        self.ensure_fresh()
+        with self.limiter:
+            started = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as error:
+                if self.controller is not None and is_throttled(error):
+                    self.controller.on_throttle(started)
+                raise
+        if self.controller is not None:
+            self.controller.on_success(time.monotonic() - started)
+        return result
@@ -0,0 +1,194 @@
+__copyright__ = """
+    Copyright 2023-2024 Samapriya Roy
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import os
+import sqlite3
+import threading
+import time
+
+from .inventory import cache_dir
+
+
+class RegistrationState:
+    """
+    Local SQLite record of the assets cogee has registered in each collection.
+
+    The state replaces listing the Earth Engine collection on every run. It is
+    written as assets are registered and can be re-synced against Earth Engine
+    with reconcile(), which also picks up assets registered by other tools.
+
+    Args:
+        path (str, optional): SQLite file, defaults to registrations.sqlite in
+            the cogee cache directory.
+        flush_every (int): Number of recorded assets buffered before a commit.
+    """
+
+    def __init__(self, path=None, flush_every=500):
+        self.path = path or os.path.join(cache_dir(), "registrations.sqlite")
+        self.flush_every = flush_every
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._pending = []
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS collections (
+                collection TEXT PRIMARY KEY,
+                reconciled_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS assets (
+                collection TEXT NOT NULL,
+                name TEXT NOT NULL,
+                uri TEXT,
+                generation INTEGER,
+                registered_at REAL,
+                PRIMARY KEY (collection, name)
+            ) WITHOUT ROWID;
+            """
+        )
+        self._conn.commit()
+
+    def reconciled_at(self, collection):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT reconciled_at FROM collections WHERE collection = ?",
+                (collection,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def generations(self, collection):
+        """
+        Assets known to exist in a collection with their source generation.
+
+        Returns:
+            dict: Asset name to generation as a string, None when unknown.
+        """
+        self.flush()
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT name, generation FROM assets WHERE collection = ?",
+                (collection,),
+            )
+            return {
+                name: str(generation) if generation is not None else None
+                for name, generation in cursor
+            }
+
+    def record(self, collection, name, uri=None, generation=None):
+        """
+        Record an asset as present in a collection. Safe to call from workers.
+        """
+        with self._lock:
+            self._pending.append((collection, name, uri, generation, time.time()))
+            if len(self._pending) >= self.flush_every:
+                self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?, ?)", self._pending
+        )
+        self._conn.commit()
+        self._pending = []
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def iter_generations(self, collection):
+        """
+        Stream the assets of a collection with their generation in name order.
+
+        A separate connection is used so workers can keep recording assets
+        while the stream is consumed.
+
+        Yields:
+            tuple: (asset name, generation as a string or None).
+        """
+        self.flush()
+        # The stream may be closed from a different thread than it was read on
+        conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+        try:
+            cursor = conn.execute(
+                "SELECT name, generation FROM assets WHERE collection = ? ORDER BY name",
+                (collection,),
+            )
+            for name, generation in cursor:
+                yield name, str(generation) if generation is not None else None
+        finally:
+            conn.close()
+
+    def reconcile(self, collection, assets):
+        """
+        Make the state of a collection match the assets listed in Earth Engine.
+
+        Assets missing from the state are added without a source URI, assets
+        no longer in Earth Engine are dropped and known generations are
+        updated. The listing is streamed through a temporary table so it is
+        never held in memory.
+
+        Args:
+            collection (str): The collection asset path.
+            assets (iterable): (asset name, generation or None) pairs for the
+                assets currently in the collection.
+
+        Returns:
+            tuple: (number of assets added, number of assets removed).
+        """
+        with self._lock:
+            self._flush()
+            conn = self._conn
+            conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS listed (name TEXT PRIMARY KEY, generation INTEGER)"
+            )
+            conn.execute("DELETE FROM listed")
+            batch = []
+            for pair in assets:
+                batch.append(pair)
+                if len(batch) >= 10000:
+                    conn.executemany("INSERT OR REPLACE INTO listed VALUES (?, ?)", batch)
+                    batch = []
+            conn.executemany("INSERT OR REPLACE INTO listed VALUES (?, ?)", batch)
+            added = conn.execute(
+                "INSERT INTO assets (collection, name, generation) "
+                "SELECT ?, name, generation FROM listed WHERE name NOT IN "
+                "(SELECT name FROM assets WHERE collection = ?)",
+                (collection, collection),
+            ).rowcount
+            removed = conn.execute(
+                "DELETE FROM assets WHERE collection = ? AND name NOT IN (SELECT name FROM listed)",
+                (collection,),
+            ).rowcount
+            conn.execute(
+                "UPDATE assets SET generation = "
+                "(SELECT generation FROM listed WHERE listed.name = assets.name) "
+                "WHERE collection = ? AND name IN "
+                "(SELECT name FROM listed WHERE generation IS NOT NULL)",
+                (collection,),
+            )
+            conn.execute("DELETE FROM listed")
+            conn.execute(
+                "INSERT OR REPLACE INTO collections VALUES (?, ?)",
+                (collection, time.time()),
+            )
+            conn.commit()
+        return added, removed
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
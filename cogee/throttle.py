@@ -0,0 +1,226 @@
+__copyright__ = """
+    Copyright 2023-2024 Samapriya Roy
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import logging
+import threading
+import time
+
+THROTTLE_STATUS_CODES = {429, 500, 502, 503, 504}
+THROTTLE_MARKERS = (
+    "too many",
+    "resource_exhausted",
+    "resource exhausted",
+    "quota exceeded",
+    "rate limit",
+    "internal error",
+    "backend error",
+    "service unavailable",
+    "unavailable",
+)
+
+
+def status_code(error):
+    """
+    HTTP status attached to an error raised by the Earth Engine client, if any.
+    """
+    for candidate in (error, getattr(error, "__cause__", None)):
+        if candidate is None:
+            continue
+        code = getattr(candidate, "status_code", None)
+        if code is None:
+            code = getattr(getattr(candidate, "resp", None), "status", None)
+        if code is not None:
+            try:
+                return int(code)
+            except (TypeError, ValueError):
+                pass
+    return None
+
+
+def is_throttled(error):
+    """
+    Check whether an error means Earth Engine is overloaded or rate limiting us.
+
+    Args:
+        error (Exception): Error raised by an Earth Engine request.
+
+    Returns:
+        bool: True for 429, RESOURCE_EXHAUSTED and 5xx style errors.
+    """
+    if status_code(error) in THROTTLE_STATUS_CODES:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter with a cap on concurrent calls.
+
+    Used as a context manager around each Earth Engine request. A limiter is
+    shared by all threads talking to the same Earth Engine project.
+
+    Args:
+        qps (float, optional): Sustained requests per second, unlimited if None.
+        max_concurrent (int, optional): Maximum requests in flight, unlimited if None.
+        burst (int): Number of requests that may be issued back to back.
+    """
+
+    def __init__(self, qps=None, max_concurrent=None, burst=1):
+        self.qps = qps
+        self.max_concurrent = max_concurrent
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.calls = 0
+        self.first_call = None
+        self.last_call = None
+        self._in_flight = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+
+    def _take_token(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self._updated) * self.qps
+                )
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.qps
+            time.sleep(delay)
+
+    def acquire(self):
+        with self._slot_freed:
+            while self.max_concurrent and self._in_flight >= self.max_concurrent:
+                self._slot_freed.wait()
+            self._in_flight += 1
+        if self.qps:
+            self._take_token()
+        with self._lock:
+            now = time.monotonic()
+            self.calls += 1
+            if self.first_call is None:
+                self.first_call = now
+            self.last_call = now
+
+    def set_max_concurrent(self, max_concurrent):
+        with self._slot_freed:
+            self.max_concurrent = max_concurrent
+            self._slot_freed.notify_all()
+
+    def release(self):
+        with self._slot_freed:
+            self._in_flight -= 1
+            self._slot_freed.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+        return False
+
+    def achieved_qps(self):
+        """
+        Average request rate between the first and the last request.
+        """
+        with self._lock:
+            if self.calls < 2 or self.last_call == self.first_call:
+                return None
+            return (self.calls - 1) / (self.last_call - self.first_call)
+
+
+class AdaptiveConcurrency:
+    """
+    Additive increase, multiplicative decrease control of a limiter's concurrency.
+
+    Concurrency grows by one after every round of successful requests (one
+    request per allowed slot) as long as latency stays close to the best seen
+    so far, and is cut in half when Earth Engine throttles or fails with a 5xx.
+    Errors from requests started before the last decrease are ignored so one
+    burst of errors only halves concurrency once.
+
+    Args:
+        limiter (RateLimiter): The limiter whose max_concurrent is adjusted.
+        initial (int): Starting concurrency.
+        minimum (int): Lowest concurrency allowed.
+        maximum (int): Highest concurrency allowed.
+        latency_factor (float): Latency above this multiple of the baseline
+            pauses increases.
+    """
+
+    def __init__(
+        self,
+        limiter,
+        initial,
+        minimum=1,
+        maximum=None,
+        latency_factor=2.0,
+    ):
+        self.limiter = limiter
+        self.minimum = max(minimum, 1)
+        self.maximum = maximum
+        self.latency_factor = latency_factor
+        self.limit = max(initial, self.minimum)
+        self.adjustments = 0
+        self._latency = None
+        self._baseline = None
+        self._successes = 0
+        self._last_decrease = None
+        self._lock = threading.Lock()
+        self.limiter.set_max_concurrent(self.limit)
+
+    def _set(self, limit, reason):
+        logging.info(f"Adjusting Earth Engine concurrency {self.limit} -> {limit}: {reason}")
+        self.limit = limit
+        self.adjustments += 1
+        self.limiter.set_max_concurrent(limit)
+
+    def on_success(self, latency):
+        with self._lock:
+            if self._latency is None:
+                self._latency = latency
+            else:
+                self._latency = 0.8 * self._latency + 0.2 * latency
+            if self._baseline is None or self._latency < self._baseline:
+                self._baseline = self._latency
+            self._successes += 1
+            if self._successes < self.limit:
+                return
+            self._successes = 0
+            if self._latency > self._baseline * self.latency_factor:
+                return
+            if self.maximum is None or self.limit < self.maximum:
+                self._set(
+                    self.limit + 1, f"healthy, average latency {self._latency:.2f}s"
+                )
+
+    def on_throttle(self, started):
+        """
+        Args:
+            started (float): time.monotonic() at which the failed request started.
+        """
+        with self._lock:
+            if self._last_decrease is not None and started < self._last_decrease:
+                return
+            self._last_decrease = time.monotonic()
+            self._successes = 0
+            limit = max(self.minimum, self.limit // 2)
+            if limit != self.limit:
+                self._set(limit, "throttled by Earth Engine")
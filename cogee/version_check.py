@@ -0,0 +1,160 @@
+__copyright__ = """
+    Copyright 2023-2024 Samapriya Roy
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import json
+import os
+import threading
+import time
+from importlib import metadata
+
+from .inventory import cache_dir
+
+PYPI_URL = "https://pypi.org/pypi/cogee/json"
+DISABLE_ENV = "COGEE_NO_VERSION_CHECK"
+CACHE_TTL_SECONDS = 24 * 60 * 60
+REQUEST_TIMEOUT_SECONDS = 3
+
+
+def compare_versions(version1, version2):
+    """
+    Compare two version strings.
+
+    Args:
+        version1 (str): The first version string.
+        version2 (str): The second version string.
+
+    Returns:
+        int: 1 if version1 > version2, -1 if version1 < version2, 0 if equal.
+    """
+    versions1 = [int(v) for v in version1.split(".")]
+    versions2 = [int(v) for v in version2.split(".")]
+    for i in range(max(len(versions1), len(versions2))):
+        v1 = versions1[i] if i < len(versions1) else 0
+        v2 = versions2[i] if i < len(versions2) else 0
+        if v1 > v2:
+            return 1
+        elif v1 < v2:
+            return -1
+    return 0
+
+
+def cache_path():
+    """
+    Location of the on-disk version cache, honouring XDG_CACHE_HOME.
+    """
+    return os.path.join(cache_dir(), "version.json")
+
+
+def read_cache(ttl=CACHE_TTL_SECONDS):
+    """
+    Return the cached latest PyPI version if the cache is younger than ttl.
+    """
+    try:
+        with open(cache_path()) as f:
+            cached = json.load(f)
+        if time.time() - cached["checked_at"] < ttl:
+            return cached["latest"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def write_cache(latest):
+    path = cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"latest": latest, "checked_at": time.time()}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def fetch_latest(timeout=REQUEST_TIMEOUT_SECONDS):
+    """
+    Fetch the latest released version of cogee from the PyPI JSON endpoint.
+    """
+    import requests
+
+    response = requests.get(PYPI_URL, timeout=timeout)
+    response.raise_for_status()
+    return response.json()["info"]["version"]
+
+
+def installed_version():
+    try:
+        return metadata.version("cogee")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+class VersionCheck:
+    """
+    Background check against PyPI for a newer cogee release.
+
+    A fresh cached result is used directly; otherwise PyPI is queried from a
+    daemon thread so command execution is never blocked on the network.
+    """
+
+    def __init__(self, ttl=CACHE_TTL_SECONDS, timeout=REQUEST_TIMEOUT_SECONDS):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.latest = None
+        self._thread = None
+
+    def start(self):
+        self.latest = read_cache(self.ttl)
+        if self.latest is None:
+            self._thread = threading.Thread(
+                target=self._refresh, name="cogee-version-check", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def _refresh(self):
+        try:
+            self.latest = fetch_latest(self.timeout)
+            write_cache(self.latest)
+        except Exception:
+            # Version checks are best effort, never fail a command over them
+            self.latest = None
+
+    def report(self, wait=0.2):
+        """
+        Print an upgrade notice if the check has completed within wait seconds.
+        """
+        if self._thread is not None:
+            self._thread.join(wait)
+            if self._thread.is_alive():
+                return
+        current = installed_version()
+        if self.latest is None or current is None:
+            return
+        try:
+            vcheck = compare_versions(self.latest, current)
+        except ValueError:
+            return
+        if vcheck == 1:
+            print(
+                f"Current version of cogee is {current} upgrade to latest version: {self.latest}"
+            )
+        elif vcheck == -1:
+            print(
+                f"Possibly running staging code {current} compared to pypi release {self.latest}"
+            )
+
+
+def version_check_disabled(flag=False):
+    return flag or os.environ.get(DISABLE_ENV, "").lower() in ("1", "true", "yes")
@@ -0,0 +1,226 @@
+__copyright__ = """
+    Copyright 2023-2024 Samapriya Roy
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+__license__ = "Apache 2.0"
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import Counter, namedtuple
+from contextlib import closing
+
+from .inventory import CogRecord
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+# Outcomes acked as done, anything else is recorded as failed
+COMPLETED = ("registered", "updated", "skipped")
+
+Task = namedtuple("Task", ["id", "bucket", "collection", "item", "replace"])
+
+
+class WorkQueue:
+    """
+    SQLite work queue shared by register workers on one host.
+
+    Tasks are leased in batches: a lease hides the tasks from other workers
+    until its visibility timeout expires. A worker acks its batch once the
+    assets are registered, and the leases of a worker that crashed simply
+    expire so the tasks are handed out again. Registration is idempotent
+    (already existing assets are skipped), so redelivered tasks are safe.
+
+    Args:
+        path (str): SQLite file of the queue.
+        max_deliveries (int): Leases after which a task that was never acked
+            is marked failed instead of handed out again.
+    """
+
+    # stays below SQLite's default limit of 999 bound parameters
+    BATCH_SIZE = 500
+
+    def __init__(self, path, max_deliveries=5):
+        self.path = path
+        self.max_deliveries = max_deliveries
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY,
+                    bucket TEXT NOT NULL,
+                    collection TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    item TEXT NOT NULL,
+                    replace INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    deliveries INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    outcome TEXT,
+                    UNIQUE (collection, name)
+                );
+                CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires);
+                """
+            )
+
+    def _connect(self):
+        # Transactions are managed explicitly so leases are taken atomically
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def enqueue(self, bucket, collection, candidates):
+        """
+        Add candidates to the queue, resetting tasks that were done or failed.
+
+        Args:
+            bucket (str): Bucket holding the COGs.
+            collection (str): Collection the COGs are registered to.
+            candidates (iterable): (CogRecord, replace) tuples.
+
+        Returns:
+            int: Number of tasks added or requeued.
+        """
+        queued = 0
+        with closing(self._connect()) as conn:
+            batch = []
+            for item, replace in candidates:
+                batch.append(
+                    (bucket, collection, item.name, json.dumps(item.astuple()), int(replace))
+                )
+                if len(batch) >= self.BATCH_SIZE:
+                    queued += self._insert(conn, batch)
+                    batch = []
+            queued += self._insert(conn, batch)
+        return queued
+
+    def _insert(self, conn, batch):
+        if not batch:
+            return 0
+        conn.execute("BEGIN IMMEDIATE")
+        # Tasks still pending or leased are left alone and must not be counted
+        changes = conn.total_changes
+        conn.executemany(
+            f"""
+            INSERT INTO tasks (bucket, collection, name, item, replace, status)
+            VALUES (?, ?, ?, ?, ?, '{PENDING}')
+            ON CONFLICT (collection, name) DO UPDATE SET
+                bucket = excluded.bucket,
+                item = excluded.item,
+                replace = excluded.replace,
+                status = '{PENDING}',
+                deliveries = 0,
+                outcome = NULL
+            WHERE tasks.status IN ('{DONE}', '{FAILED}')
+            """,
+            batch,
+        )
+        queued = conn.total_changes - changes
+        conn.execute("COMMIT")
+        return queued
+
+    def lease(self, owner, count, visibility_timeout):
+        """
+        Lease up to count pending tasks, including tasks whose lease expired.
+
+        Returns:
+            list: Leased Tasks, empty when nothing can be leased right now.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            abandoned = conn.execute(
+                f"UPDATE tasks SET status = '{FAILED}', outcome = 'abandoned', lease_owner = NULL "
+                f"WHERE status = '{LEASED}' AND lease_expires < ? AND deliveries >= ?",
+                (now, self.max_deliveries),
+            ).rowcount
+            if abandoned:
+                logging.warning(
+                    f"Gave up on {abandoned} tasks leased {self.max_deliveries} times without an ack"
+                )
+            rows = conn.execute(
+                f"SELECT id, bucket, collection, item, replace FROM tasks "
+                f"WHERE status = '{PENDING}' OR (status = '{LEASED}' AND lease_expires < ?) "
+                f"ORDER BY id LIMIT ?",
+                (now, count),
+            ).fetchall()
+            conn.executemany(
+                f"UPDATE tasks SET status = '{LEASED}', lease_owner = ?, lease_expires = ?, "
+                f"deliveries = deliveries + 1 WHERE id = ?",
+                [(owner, now + visibility_timeout, row[0]) for row in rows],
+            )
+            conn.execute("COMMIT")
+        return [
+            Task(task_id, bucket, collection, CogRecord(*json.loads(item)), bool(replace))
+            for task_id, bucket, collection, item, replace in rows
+        ]
+
+    def ack(self, owner, results):
+        """
+        Record the outcome of leased tasks.
+
+        Tasks whose lease expired and was taken by another worker in the
+        meantime are left to that worker.
+
+        Args:
+            owner (str): The worker that leased the tasks.
+            results (list): (task id, outcome) tuples.
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE tasks SET status = ?, outcome = ?, lease_owner = NULL, lease_expires = NULL "
+                f"WHERE id = ? AND lease_owner = ? AND status = '{LEASED}'",
+                [
+                    (DONE if outcome in COMPLETED else FAILED, outcome, task_id, owner)
+                    for task_id, outcome in results
+                ],
+            )
+            conn.execute("COMMIT")
+
+    def counts(self):
+        """
+        Number of tasks per status, expired leases count as pending.
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT CASE WHEN status = '{LEASED}' AND lease_expires < ? "
+                f"THEN '{PENDING}' ELSE status END, count(*) FROM tasks GROUP BY 1",
+                (time.time(),),
+            ).fetchall()
+        return Counter(dict(rows))
+
+    def summary(self):
+        counts = self.counts()
+        return (
+            f"{counts[PENDING]} pending, {counts[LEASED]} leased, "
+            f"{counts[DONE]} done and {counts[FAILED]} failed tasks"
+        )
+
+    def next_expiry(self):
+        """
+        Seconds until the next lease held by another worker expires, None if none.
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                f"SELECT min(lease_expires) FROM tasks WHERE status = '{LEASED}'"
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(row[0] - time.time(), 0)
@@ -14,8 +14,10 @@ setuptools.setup(
     install_requires=[
         "earthengine-api>=0.1.367",
         "requests>=2.22.0",
-        "beautifulsoup4>=4.9.0"
     ],
+    extras_require={
+        "parquet": ["pyarrow>=7.0.0"],
+    },
     license="Apache 2.0",
     long_description=readme(),
     long_description_content_type="text/markdown",
@@ -0,0 +1,40 @@
+import os
+
+from cogee.inventory import read_inventory_reports, report_files
+
+HEADER = "bucket,name,size,timeCreated,updated,generation\n"
+
+
+def write_report(path, names, modified):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        f.write(HEADER)
+        for name in names:
+            f.write(f"bucket,{name},10,2024-01-01T00:00:00Z,2024-01-01T00:00:00Z,1\n")
+    os.utime(path, (modified, modified))
+
+
+def test_folder_reads_the_newest_snapshot(tmp_path):
+    config = "2b3e4a5c"
+    write_report(tmp_path / f"{config}_2024-01-01T00:00_0.csv", ["old.tif"], 1000)
+    write_report(tmp_path / f"{config}_2024-01-02T00:00_0.csv", ["a.tif"], 2000)
+    write_report(tmp_path / f"{config}_2024-01-02T00:00_1.csv", ["b.tif"], 2001)
+    assert [os.path.basename(path) for path in report_files(str(tmp_path))] == [
+        f"{config}_2024-01-02T00:00_0.csv",
+        f"{config}_2024-01-02T00:00_1.csv",
+    ]
+    names = [record.name for record in read_inventory_reports(str(tmp_path), "bucket")]
+    assert names == ["a.tif", "b.tif"]
+
+
+def test_dated_folders(tmp_path):
+    write_report(tmp_path / "2024-01-01" / "report_0.csv", ["old.tif"], 1000)
+    write_report(tmp_path / "2024-01-02" / "report_0.csv", ["new.tif"], 2000)
+    assert report_files(str(tmp_path)) == [str(tmp_path / "2024-01-02" / "report_0.csv")]
+
+
+def test_report_file_is_read_as_is(tmp_path):
+    path = tmp_path / "report_2024-01-01T00:00_0.csv"
+    write_report(path, ["old.tif"], 1000)
+    write_report(tmp_path / "report_2024-01-02T00:00_0.csv", ["new.tif"], 2000)
+    assert report_files(str(path)) == [str(path)]
@@ -0,0 +1,85 @@
+from cogee.inventory import CogRecord
+from cogee.journal import Journal, read_journal
+
+RUN = {"bucket": "bucket", "prefix": "cogs", "collection": "projects/p/assets/c"}
+
+
+def records(count):
+    return [CogRecord(f"cogs/scene_{i}.tif", 10, 0, 0, i + 1) for i in range(count)]
+
+
+def write(path, items, outcomes, planned=True):
+    journal = Journal(str(path)).start(RUN)
+    for item in items:
+        journal.plan(item)
+    if planned:
+        journal.planned(len(items))
+    for item, outcome in outcomes:
+        journal.outcome(item, outcome)
+    journal.close()
+
+
+def pending_names(pending):
+    return [item.name for item, _ in pending]
+
+
+def test_torn_final_line_is_ignored(tmp_path):
+    path = tmp_path / "run.journal"
+    items = records(3)
+    write(path, items, [(items[0], "registered")])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op": "done", "name": "cogs/scene_1.t')
+    header, pending, completed, complete = read_journal(str(path))
+    assert header["collection"] == RUN["collection"]
+    assert pending_names(pending) == ["cogs/scene_1.tif", "cogs/scene_2.tif"]
+    assert completed == 1
+    assert complete
+
+
+def test_failure_followed_by_success_is_completed(tmp_path):
+    path = tmp_path / "run.journal"
+    items = records(2)
+    write(
+        path,
+        items,
+        [(items[0], "failed"), (items[1], "registered"), (items[0], "updated")],
+    )
+    _, pending, completed, _ = read_journal(str(path))
+    assert pending == []
+    assert completed == 2
+
+
+def test_failure_is_retried(tmp_path):
+    path = tmp_path / "run.journal"
+    items = records(2)
+    write(path, items, [(items[0], "skipped"), (items[1], "failed")])
+    _, pending, completed, _ = read_journal(str(path))
+    assert [(item.astuple(), replace) for item, replace in pending] == [
+        (items[1].astuple(), False)
+    ]
+    assert completed == 1
+
+
+def test_plan_that_never_finished(tmp_path):
+    path = tmp_path / "run.journal"
+    items = records(3)
+    write(path, items[:2], [(items[0], "registered")], planned=False)
+    _, pending, completed, complete = read_journal(str(path))
+    assert not complete
+    assert pending_names(pending) == ["cogs/scene_1.tif"]
+    assert completed == 1
+
+
+def test_append_after_torn_line(tmp_path):
+    path = tmp_path / "run.journal"
+    items = records(3)
+    write(path, items, [(items[0], "registered")])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op": "done", "name": "cogs/sce')
+    journal = Journal(str(path)).start(RUN, append=True)
+    journal.outcome(items[1], "registered")
+    journal.close()
+    _, pending, completed, _ = read_journal(str(path))
+    # The resumed outcome is not glued onto the torn line
+    assert pending_names(pending) == ["cogs/scene_2.tif"]
+    assert completed == 2
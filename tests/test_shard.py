@@ -0,0 +1,55 @@
+import argparse
+
+import pytest
+
+from cogee.cogee import in_shard, parse_shard, shard_of, unique_by_asset_name
+from cogee.inventory import CogRecord
+
+COLLECTION = "projects/my-project/assets/my-collection"
+
+
+def planned_assets(names):
+    records = [CogRecord(name, 1, 0, 0, 1) for name in names]
+    return [f"{COLLECTION}/{name}" for name, _ in unique_by_asset_name(records)]
+
+
+def test_union_of_shards_is_the_unsharded_plan():
+    names = [f"folder_{i % 7}/scene_{i}.tif" for i in range(2000)]
+    # Collisions are dropped before sharding and must not reappear in any shard
+    names += ["other/scene_1.tif", "other/scene_2.tiff"]
+    plan = planned_assets(names)
+    for count in (1, 2, 3, 8):
+        shards = [
+            [asset_id for asset_id in plan if in_shard(asset_id, (index, count))]
+            for index in range(count)
+        ]
+        union = [asset_id for shard in shards for asset_id in shard]
+        assert sorted(union) == sorted(plan)
+        assert len(set(union)) == len(union)
+
+
+def test_shards_are_balanced():
+    plan = planned_assets(f"scene_{i}.tif" for i in range(4000))
+    sizes = [sum(in_shard(asset_id, (index, 4)) for asset_id in plan) for index in range(4)]
+    assert min(sizes) > 900
+
+
+def test_shard_of_is_stable():
+    # Machines must agree on shards, so the values may never change
+    assert [shard_of(f"{COLLECTION}/scene_{i}", 1000) for i in range(3)] == [867, 316, 545]
+    assert shard_of(f"{COLLECTION}/scene_1", 1) == 0
+
+
+def test_no_shard_keeps_everything():
+    assert in_shard(f"{COLLECTION}/scene_1", None)
+
+
+@pytest.mark.parametrize("value, expected", [("0/4", (0, 4)), ("3/4", (3, 4)), ("0/1", (0, 1))])
+def test_parse_shard(value, expected):
+    assert parse_shard(value) == expected
+
+
+@pytest.mark.parametrize("value", ["4/4", "-1/4", "0/0", "1", "a/b", "1/2/3"])
+def test_parse_shard_rejects_invalid_values(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_shard(value)
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+
+from cogee.throttle import AdaptiveConcurrency, RateLimiter, is_throttled
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+class FakeEndpoint:
+    """
+    An Earth Engine stand-in that throttles requests beyond its capacity.
+    """
+
+    def __init__(self, capacity, latency=0.002, error=Throttled):
+        self.capacity = capacity
+        self.latency = latency
+        self.error = error
+        self.in_flight = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.in_flight += 1
+            overloaded = self.in_flight > self.capacity
+        try:
+            time.sleep(self.latency)
+            if overloaded:
+                with self._lock:
+                    self.throttled += 1
+                raise self.error("RESOURCE_EXHAUSTED: Too many concurrent requests")
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def call(controller, endpoint):
+    # The same bookkeeping as EESession.call
+    with controller.limiter:
+        started = time.monotonic()
+        try:
+            result = endpoint()
+        except Exception as error:
+            if is_throttled(error):
+                controller.on_throttle(started)
+            raise
+    controller.on_success(time.monotonic() - started)
+    return result
+
+
+def run(controller, endpoint, threads, seconds):
+    """
+    Keep every thread busy for a while and sample the concurrency limit.
+    """
+    stop = threading.Event()
+    limits = []
+
+    def work():
+        while not stop.is_set():
+            try:
+                call(controller, endpoint)
+            except Exception:
+                pass
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        limits.append(controller.limit)
+        time.sleep(0.005)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return limits
+
+
+def test_converges_to_endpoint_capacity():
+    endpoint = FakeEndpoint(capacity=6)
+    controller = AdaptiveConcurrency(RateLimiter(), initial=1, maximum=16)
+    limits = run(controller, endpoint, threads=16, seconds=0.5)
+    assert endpoint.throttled > 0
+    # Oscillates around the capacity once it is first reached
+    reached = next(i for i, limit in enumerate(limits) if limit >= endpoint.capacity)
+    settled = limits[reached:]
+    assert min(settled) >= endpoint.capacity // 2
+    assert max(settled) <= endpoint.capacity + 2
+
+
+def test_grows_to_maximum_without_throttling():
+    endpoint = FakeEndpoint(capacity=100)
+    controller = AdaptiveConcurrency(RateLimiter(), initial=1, maximum=8)
+    run(controller, endpoint, threads=8, seconds=0.2)
+    assert endpoint.throttled == 0
+    assert controller.limit == 8
+
+
+@pytest.mark.parametrize("error", [Throttled, Exception], ids=["429", "RESOURCE_EXHAUSTED"])
+def test_halves_on_throttling(error):
+    endpoint = FakeEndpoint(capacity=0, error=error)
+    controller = AdaptiveConcurrency(RateLimiter(), initial=8)
+    with pytest.raises(error):
+        call(controller, endpoint)
+    assert controller.limit == 4
+    assert controller.limiter.max_concurrent == 4
+
+
+def test_ignores_errors_from_before_the_last_decrease():
+    controller = AdaptiveConcurrency(RateLimiter(), initial=8, minimum=2)
+    started = time.monotonic()
+    controller.on_throttle(time.monotonic())
+    assert controller.limit == 4
+    # Requests in flight during the decrease fail too and must not halve again
+    controller.on_throttle(started)
+    assert controller.limit == 4
+    controller.on_throttle(time.monotonic())
+    assert controller.limit == 2
+    controller.on_throttle(time.monotonic())
+    assert controller.limit == 2